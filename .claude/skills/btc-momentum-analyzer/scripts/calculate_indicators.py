@@ -15,7 +15,131 @@
 import json
 import sys
 import argparse
-from typing import List, Dict, Any, Optional
+import threading
+from functools import lru_cache
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Optional
+
+try:
+    import orjson  # 可选加速：安装后输出走 orjson，否则回退到标准库 json
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=16)
+def _make_ema_kernel(period: int) -> Callable[[List[float], List[Optional[float]]], None]:
+    """
+    生成指定周期的 EMA 递推内核
+
+    周期与平滑系数在生成时固定进闭包，调用时不再重复计算；
+    常用周期只有 {9, 12, 26, 52}，每个周期只生成一次。
+
+    返回的 kernel(values, out) 在预分配的 out 中写入 EMA：
+    out[period-1] 为 SMA 种子，之后逐根递推。调用方需保证
+    len(values) >= period 且 len(out) >= len(values)，
+    out 中 period-1 之前的位置保持原值（通常为 None）。
+    """
+    multiplier = 2 / (period + 1)
+    seed_index = period - 1
+
+    def kernel(values: List[float], out: List[Optional[float]]) -> None:
+        # 第一个 EMA 使用 SMA
+        prev = sum(values[:period]) / period
+        out[seed_index] = prev
+
+        # 后续 EMA（上一值保存在局部变量中，不回读 out[i - 1]）
+        for i in range(period, len(values)):
+            prev = (values[i] - prev) * multiplier + prev
+            out[i] = prev
+
+    return kernel
+
+
+def _ema_pair_kernel(
+    values: List[float],
+    short: int,
+    long: int,
+    out_short: List[Optional[float]],
+    out_long: List[Optional[float]],
+) -> None:
+    """
+    两条 EMA 共用一次遍历（如 EMA26/EMA52）
+
+    短周期 EMA 先单独推进到长周期的种子位置，之后两条 EMA 在同一个循环里
+    递推，每根 K 线只读取一次 values[i]。结果与分别调用单周期内核一致。
+    调用方需保证 short <= long <= len(values)。
+    """
+    # 短周期 EMA 推进到长周期种子位置
+    _make_ema_kernel(short)(values[:long], out_short)
+
+    short_multiplier = 2 / (short + 1)
+    long_multiplier = 2 / (long + 1)
+    short_prev = out_short[long - 1]
+    long_prev = sum(values[:long]) / long
+    out_long[long - 1] = long_prev
+
+    for i in range(long, len(values)):
+        value = values[i]
+        short_prev = (value - short_prev) * short_multiplier + short_prev
+        out_short[i] = short_prev
+        long_prev = (value - long_prev) * long_multiplier + long_prev
+        out_long[i] = long_prev
+
+
+def _macd_kernel(
+    closes: List[float],
+    fast: int,
+    slow: int,
+    signal: int,
+    out_dif: List[Optional[float]],
+    out_dea: List[Optional[float]],
+    out_hist: List[Optional[float]],
+) -> None:
+    """
+    MACD 融合内核
+
+    快线、慢线 EMA 与 DEA 共用一次遍历，三个递推状态保存在局部变量中，
+    不再生成中间的快慢线数组。结果与分别计算三条 EMA 完全一致：
+    各 EMA 以 SMA 为种子，DEA 以前 signal 个 DIF 的均值为种子。
+    """
+    n = len(closes)
+    dif_start = max(fast, slow) - 1
+    dea_start = dif_start + signal - 1
+    if n <= dif_start:
+        return
+
+    fast_multiplier = 2 / (fast + 1)
+    slow_multiplier = 2 / (slow + 1)
+    signal_multiplier = 2 / (signal + 1)
+
+    # 快慢线分别以 SMA 为种子，推进到 DIF 的起点
+    ema_fast = sum(closes[:fast]) / fast
+    for close in closes[fast:dif_start + 1]:
+        ema_fast = (close - ema_fast) * fast_multiplier + ema_fast
+
+    ema_slow = sum(closes[:slow]) / slow
+    for close in closes[slow:dif_start + 1]:
+        ema_slow = (close - ema_slow) * slow_multiplier + ema_slow
+
+    dea = None
+    for i in range(dif_start, n):
+        if i > dif_start:
+            close = closes[i]
+            ema_fast = (close - ema_fast) * fast_multiplier + ema_fast
+            ema_slow = (close - ema_slow) * slow_multiplier + ema_slow
+
+        dif = ema_fast - ema_slow
+        out_dif[i] = dif
+
+        if i < dea_start:
+            continue
+        if i == dea_start:
+            dea = sum(out_dif[dif_start:i + 1]) / signal
+        else:
+            dea = (dif - dea) * signal_multiplier + dea
+
+        out_dea[i] = dea
+        out_hist[i] = dif - dea
 
 
 class IndicatorCalculator:
@@ -25,6 +149,10 @@ class IndicatorCalculator:
         self.ema_periods = ema_periods
         self.macd_fast, self.macd_slow, self.macd_signal = macd_params
 
+        # annotate_candles 使用的指标列暂存区，按线程复用（数据库按时间级别并发计算）
+        self._column_keys = [f"ema{period}" for period in ema_periods] + ["dif", "dea", "histogram"]
+        self._scratch = threading.local()
+
     def calculate_ema(self, values: List[float], period: int) -> List[Optional[float]]:
         """
         计算指数移动平均线 (EMA)
@@ -36,21 +164,13 @@ class IndicatorCalculator:
         返回：
             EMA 值列表，前 period-1 个值为 None
         """
-        if len(values) < period:
-            return [None] * len(values)
-
-        ema = [None] * (period - 1)
-        multiplier = 2 / (period + 1)
-
-        # 第一个 EMA 使用 SMA
-        sma = sum(values[: period]) / period
-        ema.append(sma)
-
-        # 后续 EMA
-        for i in range(period, len(values)):
-            ema_val = (values[i] - ema[-1]) * multiplier + ema[-1]
-            ema.append(ema_val)
+        n = len(values)
+        if n < period:
+            return [None] * n
 
+        # 一次性预分配结果数组，由内核按下标写入，避免 append 扩容
+        ema = [None] * n
+        _make_ema_kernel(period)(values, ema)
         return ema
 
     def calculate_macd(
@@ -66,37 +186,71 @@ class IndicatorCalculator:
                 "histogram": 柱状图列表（DIF - DEA）
             }
         """
-        # 计算快慢 EMA
-        ema_fast = self.calculate_ema(closes, self.macd_fast)
-        ema_slow = self.calculate_ema(closes, self.macd_slow)
-
-        # 计算 DIF
-        dif = []
-        for f, s in zip(ema_fast, ema_slow):
-            if f is not None and s is not None:
-                dif.append(f - s)
-            else:
-                dif.append(None)
+        n = len(closes)
+        dif = [None] * n
+        dea = [None] * n
+        histogram = [None] * n
+
+        # 快线、慢线、DEA 在一次遍历中同步递推
+        _macd_kernel(
+            closes, self.macd_fast, self.macd_slow, self.macd_signal,
+            dif, dea, histogram,
+        )
+
+        return {"dif": dif, "dea": dea, "histogram": histogram}
+
+    def calculate_columns(
+        self,
+        closes: List[float],
+        out: Optional[Dict[str, List[Optional[float]]]] = None,
+    ) -> Dict[str, List[Optional[float]]]:
+        """
+        按列计算全部指标（SoA）
 
-        # 计算 DEA（DIF 的 EMA）
-        valid_dif = [d for d in dif if d is not None]
-        if len(valid_dif) < self.macd_signal:
-            dea = [None] * len(dif)
+        参数：
+            closes: 收盘价数组
+            out: 可选的预分配输出列（长度不小于 len(closes)，有效起点之前须为 None）
+
+        返回：
+            {"ema26": [...], "ema52": [...], "dif": [...], "dea": [...], "histogram": [...]}
+            未传 out 时每列长度与 closes 相同
+        """
+        n = len(closes)
+        if out is None:
+            out = {key: [None] * n for key in self._column_keys}
+
+        if len(self.ema_periods) == 2 and n >= max(self.ema_periods):
+            # 常见的两条 EMA（26/52）共用一次遍历
+            short, long = sorted(self.ema_periods)
+            _ema_pair_kernel(closes, short, long, out[f"ema{short}"], out[f"ema{long}"])
         else:
-            dea_values = self.calculate_ema(valid_dif, self.macd_signal)
+            for period in self.ema_periods:
+                if n >= period:
+                    _make_ema_kernel(period)(closes, out[f"ema{period}"])
 
-            # 对齐到原始数组长度
-            dea = [None] * (len(dif) - len(dea_values)) + dea_values
+        _macd_kernel(
+            closes, self.macd_fast, self.macd_slow, self.macd_signal,
+            out["dif"], out["dea"], out["histogram"],
+        )
+        return out
 
-        # 计算 Histogram
-        histogram = []
-        for d, e in zip(dif, dea):
-            if d is not None and e is not None:
-                histogram.append(d - e)
-            else:
-                histogram.append(None)
+    def _scratch_columns(self, n: int) -> Dict[str, List[Optional[float]]]:
+        """
+        当前线程的指标列暂存区，长度至少为 n，跨调用复用
 
-        return {"dif": dif, "dea": dea, "histogram": histogram}
+        内核只写各列有效起点之后的位置，起点之前始终为 None；
+        超出 n 的旧值由调用方按 K 线数量截断忽略。
+        """
+        columns = getattr(self._scratch, "columns", None)
+        if columns is None:
+            columns = {key: [] for key in self._column_keys}
+            self._scratch.columns = columns
+
+        for column in columns.values():
+            if len(column) < n:
+                column.extend([None] * (n - len(column)))
+
+        return columns
 
     def annotate_candles(
         self, candles: List[Dict[str, Any]]
@@ -108,48 +262,98 @@ class IndicatorCalculator:
             candles: K 线数据列表
 
         返回：
-            带有指标的 K 线数据
+            带有指标的 K 线数据（原地写入指标字段，返回同一列表）
+        """
+        if not candles:
+            return candles
+
+        # 提取收盘价（itemgetter + map 在 C 层完成逐个取值）
+        closes = list(map(itemgetter("close"), candles))
+
+        # 按列计算全部指标（写入复用的暂存列）
+        columns = self.calculate_columns(closes, out=self._scratch_columns(len(closes)))
+        keys = list(columns.keys())
+
+        # 注释到 K 线数据：逐行转置指标列（zip 按 K 线数量截断暂存列）
+        for candle, row in zip(candles, zip(*columns.values())):
+            candle.update(zip(keys, row))
+
+        return candles
+
+    def annotate_columns(self, columns: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+        """
+        为按列存储的 K 线数据添加指标列
+
+        参数：
+            columns: {"timestamp": [...], "close": [...], ...}（fetch_btc_data.py --format columnar）
+
+        返回：
+            原有各列加上指标列，如 {"close": [...], "ema26": [...], "dif": [...], ...}
+        """
+        annotated = dict(columns)
+        annotated.update(self.calculate_columns(columns["close"]))
+        return annotated
+
+    def extend_candles(
+        self, candles: List[Dict[str, Any]], new_candles: List[Dict[str, Any]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        增量计算新 K 线的指标
+
+        EMA 是一步递推，已知上一根的 EMA/DEA 即可算出下一根，
+        无需对全部历史重算。快线 EMA 未单独存储，由 DIF + 慢线 EMA 还原。
+
+        参数：
+            candles: 已带指标的历史 K 线
+            new_candles: 紧接其后的新 K 线（原始 OHLCV）
+
+        返回：
+            带有指标的新 K 线列表（原地写入 new_candles）；历史指标不完整或
+            慢线周期不在 ema_periods 中时返回 None，调用方应回退到 annotate_candles
         """
         if not candles:
-            return []
+            return None
 
-        # 提取收盘价
-        closes = [c["close"] for c in candles]
+        last = candles[-1]
+        slow_key = f"ema{self.macd_slow}"
+        state_keys = [f"ema{period}" for period in self.ema_periods] + ["dif", "dea"]
+        if slow_key not in state_keys or any(last.get(k) is None for k in state_keys):
+            return None
 
-        # 计算 EMA
-        ema_values = {}
-        for period in self.ema_periods:
-            ema_values[f"ema{period}"] = self.calculate_ema(closes, period)
+        ema_state = {period: last[f"ema{period}"] for period in self.ema_periods}
+        multipliers = {period: 2 / (period + 1) for period in self.ema_periods}
+        fast_multiplier = 2 / (self.macd_fast + 1)
+        signal_multiplier = 2 / (self.macd_signal + 1)
 
-        # 计算 MACD
-        macd = self.calculate_macd(closes)
+        ema_fast = last["dif"] + last[slow_key]
+        dea = last["dea"]
 
-        # 注释到 K 线数据
-        result = []
-        for i, candle in enumerate(candles):
-            annotated = {**candle}  # 复制原始数据
+        for candle in new_candles:
+            close = candle["close"]
 
             # 添加 EMA
             for period in self.ema_periods:
-                annotated[f"ema{period}"] = ema_values[f"ema{period}"][i]
+                ema_state[period] = (close - ema_state[period]) * multipliers[period] + ema_state[period]
+                candle[f"ema{period}"] = ema_state[period]
 
             # 添加 MACD
-            annotated["dif"] = macd["dif"][i]
-            annotated["dea"] = macd["dea"][i]
-            annotated["histogram"] = macd["histogram"][i]
-
-            result.append(annotated)
+            ema_fast = (close - ema_fast) * fast_multiplier + ema_fast
+            dif = ema_fast - ema_state[self.macd_slow]
+            dea = (dif - dea) * signal_multiplier + dea
+            candle["dif"] = dif
+            candle["dea"] = dea
+            candle["histogram"] = dif - dea
 
-        return result
+        return new_candles
 
     def process_multi_timeframe(
-        self, data: Dict[str, List[Dict[str, Any]]]
-    ) -> Dict[str, List[Dict[str, Any]]]:
+        self, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
         """
         处理多时间级别数据
 
         参数：
-            data: 多时间级别的 K 线数据字典
+            data: 多时间级别的 K 线数据字典（每个时间级别为 K 线列表或按列存储的字典）
 
         返回：
             带有指标注释的多时间级别数据
@@ -158,7 +362,10 @@ class IndicatorCalculator:
 
         for timeframe, candles in data.items():
             print(f"[INFO] Calculating indicators for {timeframe}...", file=sys.stderr)
-            result[timeframe] = self.annotate_candles(candles)
+            if isinstance(candles, dict):
+                result[timeframe] = self.annotate_columns(candles)
+            else:
+                result[timeframe] = self.annotate_candles(candles)
 
         return result
 
@@ -227,6 +434,9 @@ def main():
     # 计算指标
     if is_multi_timeframe:
         result_data = calculator.process_multi_timeframe(candles_data)
+    elif isinstance(candles_data, dict):
+        # 单一时间级别的按列格式
+        result_data = calculator.annotate_columns(candles_data)
     else:
         result_data = calculator.annotate_candles(candles_data)
 
@@ -242,23 +452,33 @@ def main():
 
     if is_multi_timeframe:
         output["timeframes"] = list(result_data.keys())
+        if input_data.get("format"):
+            output["format"] = input_data["format"]
 
     # 输出结果
+    if orjson:
+        output_text = orjson.dumps(output, option=orjson.OPT_INDENT_2).decode("utf-8")
+    else:
+        output_text = json.dumps(output, indent=2, ensure_ascii=False)
+
     if args.output:
         with open(args.output, "w", encoding="utf-8") as f:
-            json.dump(output, f, indent=2, ensure_ascii=False)
+            f.write(output_text)
         print(f"[INFO] Indicators written to {args.output}", file=sys.stderr)
     else:
-        print(json.dumps(output, indent=2, ensure_ascii=False))
+        print(output_text)
+
+    # 统计信息（按列格式以 close 列长度计）
+    def count(candles):
+        return len(candles["close"]) if isinstance(candles, dict) else len(candles)
 
-    # 统计信息
     if is_multi_timeframe:
         print(f"[INFO] Indicators calculated for:", file=sys.stderr)
         for tf in result_data.keys():
-            print(f"  {tf}: {len(result_data[tf])} candles", file=sys.stderr)
+            print(f"  {tf}: {count(result_data[tf])} candles", file=sys.stderr)
     else:
         print(
-            f"[INFO] Indicators calculated for {len(result_data)} candles",
+            f"[INFO] Indicators calculated for {count(result_data)} candles",
             file=sys.stderr,
         )
 
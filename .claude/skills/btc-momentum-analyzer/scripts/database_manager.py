@@ -21,13 +21,20 @@ BTC 数据库管理器 - 增量更新系统
 日期：2025-12-11
 """
 
+import asyncio
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 import argparse
 
+try:
+    import orjson  # 可选加速：安装后数据库读写走 orjson，否则回退到标准库 json
+except ImportError:
+    orjson = None
+
 # 导入现有的脚本功能
 sys.path.insert(0, os.path.dirname(__file__))
 from fetch_btc_data import BTCDataFetcher
@@ -41,6 +48,11 @@ _REPO_ROOT = os.path.abspath(
 _DATA_DIR = os.environ.get("MACD_DATA_DIR", os.path.join(_REPO_ROOT, "data"))
 DATABASE_DIR = os.path.join(_DATA_DIR, "database")
 DATABASE_FILE = os.path.join(DATABASE_DIR, "btc_database.json")
+# 元信息边车文件：只含各时间级别的数量与最后时间，供 --status 快速读取
+DATABASE_META_FILE = os.path.join(DATABASE_DIR, "btc_database.meta.json")
+
+# 写文件缓冲区大小：json.dump 逐块流式输出，大缓冲区合并小块写入
+WRITE_BUFFER_SIZE = 1 << 20
 
 # 默认时间级别
 ALL_TIMEFRAMES = ["2d", "1d", "12h", "6h", "4h", "2h", "1h", "30m"]
@@ -65,32 +77,104 @@ class BTCDatabase:
     def __init__(self):
         self.database_dir = DATABASE_DIR
         self.database_file = DATABASE_FILE
+        self.database_meta_file = DATABASE_META_FILE
         self.fetcher = BTCDataFetcher()
         self.calculator = IndicatorCalculator(ema_periods=[26, 52], macd_params=(12, 26, 9))
 
+        # 已解析数据库的缓存，按文件 (mtime, size) 判断是否失效
+        self._db_cache = None
+        self._db_stat = None
+
         # 确保数据库目录存在
         os.makedirs(self.database_dir, exist_ok=True)
 
+    def _database_stat(self) -> Optional[tuple]:
+        """数据库文件的 (mtime_ns, size)，文件不存在时返回 None"""
+        try:
+            st = os.stat(self.database_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
     def load_database(self) -> Optional[Dict[str, Any]]:
-        """加载数据库"""
-        if not os.path.exists(self.database_file):
+        """加载数据库（文件未变化时复用上次解析结果）"""
+        db_stat = self._database_stat()
+        if db_stat is None:
             return None
 
+        if self._db_cache is not None and db_stat == self._db_stat:
+            return self._db_cache
+
         try:
-            with open(self.database_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.database_file, "rb") as f:
+                raw = f.read()
+            database = orjson.loads(raw) if orjson else json.loads(raw)
         except Exception as e:
             print(f"[ERROR] Failed to load database: {e}", file=sys.stderr)
             return None
 
-    def save_database(self, database: Dict[str, Any]):
-        """保存数据库"""
+        self._db_cache = database
+        self._db_stat = db_stat
+        return database
+
+    def save_database(self, database: Dict[str, Any], compact: bool = True):
+        """
+        保存数据库
+
+        参数：
+            database: 数据库字典
+            compact: 是否紧凑输出（默认）。数据库只供程序读取，
+                     缩进输出体积更大、编码更慢，仅在需要人工查看时使用
+        """
         try:
-            with open(self.database_file, "w", encoding="utf-8") as f:
-                json.dump(database, f, indent=2, ensure_ascii=False)
+            if orjson:
+                option = 0 if compact else orjson.OPT_INDENT_2
+                with open(self.database_file, "wb") as f:
+                    f.write(orjson.dumps(database, option=option))
+            else:
+                dump_kwargs = {"separators": (",", ":")} if compact else {"indent": 2}
+                with open(self.database_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+                    json.dump(database, f, ensure_ascii=False, **dump_kwargs)
+            self._db_cache = database
+            self._db_stat = self._database_stat()
             print(f"[INFO] Database saved to {self.database_file}", file=sys.stderr)
         except Exception as e:
+            self._db_cache = None
             print(f"[ERROR] Failed to save database: {e}", file=sys.stderr)
+            return
+
+        self._save_meta(database)
+
+    def _save_meta(self, database: Dict[str, Any]):
+        """写入元信息边车文件，附带写入时数据库文件的 (mtime_ns, size)"""
+        if self._db_stat is None:
+            return
+        meta = {"database_stat": list(self._db_stat), "status": self._build_status(database)}
+        try:
+            with open(self.database_meta_file, "w", encoding="utf-8") as f:
+                json.dump(meta, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"[WARN] Failed to save database meta: {e}", file=sys.stderr)
+
+    def _load_meta(self) -> Optional[Dict[str, Any]]:
+        """
+        读取元信息边车文件中的状态
+
+        数据库可能被其他途径单独更新或还原（如 git pull、cp -p、备份恢复），
+        因此只有记录的 (mtime_ns, size) 与当前数据库文件完全一致时才使用，
+        不一致或读取失败时返回 None
+        """
+        db_stat = self._database_stat()
+        if db_stat is None:
+            return None
+        try:
+            with open(self.database_meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if tuple(meta["database_stat"]) != db_stat:
+                return None
+            return meta["status"]
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
 
     def initialize_database(self, timeframes: List[str]):
         """
@@ -111,13 +195,11 @@ class BTCDatabase:
             "timeframes": {},
         }
 
-        for tf in timeframes:
-            print(f"\n[INFO] Initializing {tf}...", file=sys.stderr)
-
-            # 获取历史数据
-            limit = INITIAL_LIMITS.get(tf, 200)
-            candles = self.fetcher.fetch_from_okx(tf, limit)
+        # 所有时间级别的历史数据一次性并发获取
+        specs = [(tf, INITIAL_LIMITS.get(tf, 200)) for tf in timeframes]
+        fetched = asyncio.run(self.fetcher.fetch_all_async(specs))
 
+        for tf, candles in zip(timeframes, fetched):
             if not candles:
                 print(f"[WARN] Failed to fetch {tf} data, skipping...", file=sys.stderr)
                 continue
@@ -141,6 +223,66 @@ class BTCDatabase:
 
         return database
 
+    def _update_timeframe(self, tf: str, tf_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        增量更新单个时间级别
+
+        参数：
+            tf: 时间级别
+            tf_data: 数据库中该时间级别的现有数据
+
+        返回：
+            更新后的时间级别数据；获取失败或没有新K线时返回 None
+        """
+        print(f"\n[INFO] Updating {tf}...", file=sys.stderr)
+
+        # 获取现有数据
+        existing_candles = tf_data["candles"]
+        last_timestamp = tf_data["last_timestamp"]
+
+        # 获取新数据（只取最近的10根，确保能覆盖最新K线）
+        new_candles = self.fetcher.fetch_from_okx(tf, limit=10)
+
+        if not new_candles:
+            print(f"[WARN] Failed to fetch {tf} data, skipping...", file=sys.stderr)
+            return None
+
+        # 找出真正新增的K线（时间戳大于最后一根）
+        new_candles_filtered = [
+            c for c in new_candles if c["timestamp"] > last_timestamp
+        ]
+
+        if not new_candles_filtered:
+            print(f"[INFO] {tf}: No new candles", file=sys.stderr)
+            return None
+
+        # 增量计算新K线的指标（EMA是一步递推，从最后一根的指标接着算即可）
+        new_candles_with_indicators = self.calculator.extend_candles(
+            existing_candles, new_candles_filtered
+        )
+
+        if new_candles_with_indicators is not None:
+            # 原地追加，不复制已有K线列表
+            existing_candles.extend(new_candles_with_indicators)
+            all_candles_with_indicators = existing_candles
+        else:
+            # 历史指标不完整，回退到全量重算（确保EMA连续性）
+            # annotate_candles 只读取 close 并覆盖全部指标字段，无需先剥离旧指标
+            existing_candles.extend(new_candles_filtered)
+            all_candles_with_indicators = self.calculator.annotate_candles(existing_candles)
+
+        print(
+            f"[SUCCESS] {tf}: Added {len(new_candles_filtered)} new candles, total {len(all_candles_with_indicators)}",
+            file=sys.stderr,
+        )
+
+        return {
+            "candles": all_candles_with_indicators,
+            "last_timestamp": all_candles_with_indicators[-1]["timestamp"],
+            "last_updated": datetime.now().isoformat(),
+            "count": len(all_candles_with_indicators),
+        }
+
     def update_database(self, timeframes: Optional[List[str]] = None):
         """
         增量更新数据库：只获取最新的K线
@@ -160,69 +302,26 @@ class BTCDatabase:
         if timeframes is None:
             timeframes = list(database["timeframes"].keys())
 
-        updated_count = 0
-
+        pending = []
         for tf in timeframes:
             if tf not in database["timeframes"]:
                 print(f"[WARN] {tf} not in database, skipping...", file=sys.stderr)
                 continue
+            pending.append(tf)
 
-            print(f"\n[INFO] Updating {tf}...", file=sys.stderr)
-
-            # 获取现有数据
-            tf_data = database["timeframes"][tf]
-            existing_candles = tf_data["candles"]
-            last_timestamp = tf_data["last_timestamp"]
+        # 各时间级别相互独立，并发获取（网络 I/O 为主）
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            results = list(executor.map(
+                lambda tf: self._update_timeframe(tf, database["timeframes"][tf]),
+                pending,
+            ))
 
-            # 获取新数据（只取最近的10根，确保能覆盖最新K线）
-            new_candles = self.fetcher.fetch_from_okx(tf, limit=10)
-
-            if not new_candles:
-                print(f"[WARN] Failed to fetch {tf} data, skipping...", file=sys.stderr)
-                continue
-
-            # 找出真正新增的K线（时间戳大于最后一根）
-            new_candles_filtered = [
-                c for c in new_candles if c["timestamp"] > last_timestamp
-            ]
-
-            if not new_candles_filtered:
-                print(f"[INFO] {tf}: No new candles", file=sys.stderr)
-                continue
-
-            # 合并数据（保留旧数据 + 新数据）
-            # 注意：我们需要重新计算最近的指标，因为EMA是滚动计算的
-            all_candles_raw = existing_candles + new_candles_filtered
-
-            # 提取原始OHLCV数据（去掉指标，准备重新计算）
-            all_candles_ohlcv = []
-            for c in all_candles_raw:
-                all_candles_ohlcv.append({
-                    "timestamp": c["timestamp"],
-                    "datetime": c["datetime"],
-                    "open": c["open"],
-                    "high": c["high"],
-                    "low": c["low"],
-                    "close": c["close"],
-                    "volume": c["volume"],
-                })
-
-            # 重新计算所有指标（确保EMA连续性）
-            all_candles_with_indicators = self.calculator.annotate_candles(all_candles_ohlcv)
-
-            # 更新数据库
-            database["timeframes"][tf] = {
-                "candles": all_candles_with_indicators,
-                "last_timestamp": all_candles_with_indicators[-1]["timestamp"],
-                "last_updated": datetime.now().isoformat(),
-                "count": len(all_candles_with_indicators),
-            }
-
-            print(
-                f"[SUCCESS] {tf}: Added {len(new_candles_filtered)} new candles, total {len(all_candles_with_indicators)}",
-                file=sys.stderr,
-            )
-            updated_count += 1
+        # 按时间级别顺序写回数据库
+        updated_count = 0
+        for tf, tf_entry in zip(pending, results):
+            if tf_entry is not None:
+                database["timeframes"][tf] = tf_entry
+                updated_count += 1
 
         # 更新数据库元信息
         database["last_updated"] = datetime.now().isoformat()
@@ -258,12 +357,8 @@ class BTCDatabase:
         else:
             return candles
 
-    def get_status(self) -> Dict[str, Any]:
-        """获取数据库状态"""
-        database = self.load_database()
-        if not database:
-            return {"status": "not_initialized"}
-
+    def _build_status(self, database: Dict[str, Any]) -> Dict[str, Any]:
+        """从数据库提取状态信息"""
         status = {
             "status": "initialized",
             "version": database.get("version", "unknown"),
@@ -281,6 +376,18 @@ class BTCDatabase:
 
         return status
 
+    def get_status(self) -> Dict[str, Any]:
+        """获取数据库状态（优先读取元信息边车文件，无需解析整个数据库）"""
+        status = self._load_meta()
+        if status is not None:
+            return status
+
+        database = self.load_database()
+        if not database:
+            return {"status": "not_initialized"}
+
+        return self._build_status(database)
+
     def export_timeframe(self, timeframe: str, output_file: str):
         """
         导出指定时间级别的数据到文件
@@ -304,7 +411,7 @@ class BTCDatabase:
             "candles": candles,
         }
 
-        with open(output_file, "w", encoding="utf-8") as f:
+        with open(output_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
             json.dump(output_data, f, indent=2, ensure_ascii=False)
 
         print(f"[SUCCESS] Exported {len(candles)} candles to {output_file}", file=sys.stderr)
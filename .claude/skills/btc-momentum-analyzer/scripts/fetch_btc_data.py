@@ -8,23 +8,40 @@ BTC 数据获取脚本
 使用方法：
   python3 fetch_btc_data.py --symbol BTC-USDT --timeframes 1h,4h --limit 100
   python3 fetch_btc_data.py --timeframes all --cache
+  python3 fetch_btc_data.py --timeframes 1h --limit 10 --pretty
+  python3 fetch_btc_data.py --timeframes 1h,4h --format columnar
+  python3 fetch_btc_data.py --serve   # 常驻模式：stdin/stdout 逐行 JSON 请求与响应
 
 作者：Claude
 日期：2025-12-10
 """
 
+import asyncio
+import gzip
+import http.client
 import json
 import sys
 import os
 import argparse
-from datetime import datetime, timedelta
 from urllib import request, error, parse
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson  # 可选加速：安装后响应解析与缓存读写走 orjson，否则回退到标准库 json
+except ImportError:
+    orjson = None
 
 # OKX API 配置
-OKX_API_BASE = "https://www.okx.com/api/v5"
-OKX_CANDLES_ENDPOINT = f"{OKX_API_BASE}/market/candles"
+OKX_HOST = "www.okx.com"
+OKX_API_BASE = f"https://{OKX_HOST}/api/v5"
+OKX_CANDLES_PATH = "/api/v5/market/candles"
+OKX_CANDLES_ENDPOINT = f"https://{OKX_HOST}{OKX_CANDLES_PATH}"
+MAX_IDLE_CONNECTIONS = 8  # 与时间级别数量相当，全部并发请求都能复用连接
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip"}
 
 # 时间级别映射（OKX 格式）
 TIMEFRAME_MAP = {
@@ -38,6 +55,32 @@ TIMEFRAME_MAP = {
     "30m": "30m",
 }
 
+# OKX K 线接口限速：每 2 秒 20 次
+RATE_LIMIT_REQUESTS = 20
+RATE_LIMIT_WINDOW = 2.0
+
+# 缓存有效期（秒），按时间级别区分：大级别 K 线变化慢，可以缓存更久
+CACHE_TTL_SECONDS = {
+    "2d": 3600,
+    "1d": 3600,
+    "12h": 1800,
+    "6h": 900,
+    "4h": 600,
+    "2h": 300,
+    "1h": 180,
+    "30m": 60,
+}
+DEFAULT_CACHE_TTL_SECONDS = 600
+
+# K 线与抓取时间的显示格式（本地时区）
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 设置环境变量 MACD_DEBUG=1 时输出调试信息（如请求 URL）
+DEBUG = bool(os.environ.get("MACD_DEBUG"))
+
+# K 线字段（columnar 输出时每个字段一列）
+CANDLE_FIELDS = ("timestamp", "datetime", "open", "high", "low", "close", "volume")
+
 # 默认时间级别
 DEFAULT_TIMEFRAMES = ["2d", "1d", "12h", "6h", "4h", "2h", "1h", "30m"]
 
@@ -49,28 +92,191 @@ _REPO_ROOT = os.path.abspath(
 CACHE_DIR = os.environ.get("MACD_DATA_DIR", os.path.join(_REPO_ROOT, "data"))
 
 
+def _loads(raw: bytes) -> Any:
+    """解析 UTF-8 JSON 字节串"""
+    # 两种解析器都直接接受 bytes，省去一次整体解码拷贝
+    if orjson:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _parse_candles(candles_raw: List[List[str]]) -> List[Dict[str, Any]]:
+    """
+    将 OKX 原始 K 线转换为标准格式
+
+    OKX 返回从新到旧的行：[timestamp, open, high, low, close, volume, ...]，
+    这里倒序遍历，直接得到从旧到新的列表，无需再整体反转。
+
+    参数：
+        candles_raw: OKX 响应中的 data 数组
+
+    返回：
+        从旧到新的 K 线列表
+    """
+    # 列数不足的行先整体剔除，后续转换只需处理数值错误
+    rows = [candle for candle in candles_raw if len(candle) >= 6]
+    if len(rows) < len(candles_raw):
+        print(
+            f"[WARN] Skipped {len(candles_raw) - len(rows)} malformed candles",
+            file=sys.stderr,
+        )
+
+    try:
+        # 快速路径：整批数据一次列表推导转换完成
+        return [
+            {
+                "timestamp": (timestamp := int(candle[0]) / 1000),  # 毫秒转换为秒
+                "datetime": time.strftime(DATETIME_FORMAT, time.localtime(timestamp)),
+                "open": float(candle[1]),
+                "high": float(candle[2]),
+                "low": float(candle[3]),
+                "close": float(candle[4]),
+                "volume": float(candle[5]),
+            }
+            for candle in reversed(rows)
+        ]
+    except ValueError:
+        pass
+
+    # 存在异常行：逐行转换并跳过坏行
+    candles = []
+    append = candles.append
+    for candle in reversed(rows):
+        try:
+            timestamp = int(candle[0]) / 1000
+            append({
+                "timestamp": timestamp,
+                "datetime": time.strftime(DATETIME_FORMAT, time.localtime(timestamp)),
+                "open": float(candle[1]),
+                "high": float(candle[2]),
+                "low": float(candle[3]),
+                "close": float(candle[4]),
+                "volume": float(candle[5]),
+            })
+        except ValueError as e:
+            print(f"[WARN] Failed to parse candle: {candle}, error: {e}", file=sys.stderr)
+    return candles
+
+
+def _to_columns(candles: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    把 K 线列表转换为按列存储的格式
+
+    {"timestamp": [...], "datetime": [...], "open": [...], ...}
+    每个字段名只出现一次，JSON 体积约为逐根格式的一半，消费方可直接取列计算。
+    """
+    return {field: [candle[field] for candle in candles] for field in CANDLE_FIELDS}
+
+
+def _dumps(obj: Any, compact: bool = False) -> bytes:
+    """序列化为 UTF-8 JSON 字节串（默认带缩进，compact=True 时无空白）"""
+    if orjson:
+        return orjson.dumps(obj, option=0 if compact else orjson.OPT_INDENT_2)
+    if compact:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+
 class BTCDataFetcher:
     """BTC 数据获取器"""
 
     def __init__(self, symbol: str = "BTC-USDT", exchange: str = "okx"):
         self.symbol = symbol
         self.exchange = exchange.lower()
-        self.session_requests = 0
-        self.last_request_time = 0
+        # 各时间级别固定的查询串前缀，请求时只需拼接 limit / after
+        self._query_for = {
+            tf: parse.urlencode({"instId": symbol, "bar": bar})
+            for tf, bar in TIMEFRAME_MAP.items()
+        }
+        # 滑动窗口内最近的请求时刻（单调时钟）
+        self._request_times = deque()
+        # 多个时间级别可能并发请求，窗口需要加锁
+        self._rate_lock = threading.Lock()
+        # 空闲 keep-alive 连接池：跨线程、跨多次 asyncio.run 共享，避免重复握手
+        # （deque 的 append/pop 是线程安全的）
+        self._idle_conns = deque()
+        # 配置了 HTTPS 代理时 http.client 无法直连，退回 urlopen
+        self._use_proxy = bool(request.getproxies().get("https"))
 
     def _rate_limit(self):
-        """速率限制：OKX 允许 20 req/2s"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        """速率限制：滑动窗口，任意 2 秒内最多 20 次请求（OKX 限制 20 req/2s）"""
+        with self._rate_lock:
+            request_times = self._request_times
+            now = time.monotonic()
+
+            # 丢弃窗口之外的请求记录
+            while request_times and request_times[0] <= now - RATE_LIMIT_WINDOW:
+                request_times.popleft()
+
+            # 窗口已满：等到最早的一次请求移出窗口
+            if len(request_times) >= RATE_LIMIT_REQUESTS:
+                sleep_time = request_times[0] + RATE_LIMIT_WINDOW - now
+                print(f"[INFO] Rate limit: sleeping {sleep_time:.2f}s", file=sys.stderr)
+                time.sleep(sleep_time)
+                request_times.popleft()
+                now = time.monotonic()
+
+            request_times.append(now)
+
+    def _http_get(self, query: str) -> bytes:
+        """
+        请求 K 线接口，返回响应体
+
+        从共享连接池取一条空闲的 HTTPSConnection（没有则新建），请求完成后放回，
+        后续请求无论在哪个线程都能省去 TCP + TLS 握手。
+        复用的连接若已被服务端关闭，则丢弃并换一条连接重试。
+        请求 gzip 压缩传输，返回前解压。
+
+        参数：
+            query: 已编码的查询串
+
+        返回：
+            响应体（bytes）
+        """
+
+        if self._use_proxy:
+            req = request.Request(f"{OKX_CANDLES_ENDPOINT}?{query}", headers=REQUEST_HEADERS)
+            with request.urlopen(req, timeout=10) as response:
+                body = response.read()
+                encoding = response.headers.get("Content-Encoding")
+            return gzip.decompress(body) if encoding == "gzip" else body
 
-        if self.session_requests >= 20 and time_since_last < 2:
-            sleep_time = 2 - time_since_last
-            print(f"[INFO] Rate limit: sleeping {sleep_time:.2f}s", file=sys.stderr)
-            time.sleep(sleep_time)
-            self.session_requests = 0
+        path = f"{OKX_CANDLES_PATH}?{query}"
+        while True:
+            try:
+                conn = self._idle_conns.pop()
+                reused = True
+            except IndexError:
+                conn = http.client.HTTPSConnection(OKX_HOST, timeout=10)
+                reused = False
 
-        self.last_request_time = time.time()
-        self.session_requests += 1
+            try:
+                conn.request("GET", path, headers=REQUEST_HEADERS)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if reused:
+                    continue
+                raise error.URLError(e)
+
+            # 响应已读完，连接可继续复用时放回池中
+            if response.will_close or len(self._idle_conns) >= MAX_IDLE_CONNECTIONS:
+                conn.close()
+            else:
+                self._idle_conns.append(conn)
+
+            if response.status != 200:
+                raise error.HTTPError(
+                    f"{OKX_CANDLES_ENDPOINT}?{query}",
+                    response.status,
+                    response.reason,
+                    response.headers,
+                    None,
+                )
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return body
 
     def fetch_from_okx(
         self, timeframe: str, limit: int = 100
@@ -97,44 +303,39 @@ class BTCDataFetcher:
                 ...
             ]
         """
-        # 转换时间级别格式
-        bar = TIMEFRAME_MAP.get(timeframe)
-        if not bar:
+        # 时间级别对应的查询串前缀（含 OKX 格式的 bar）
+        base_query = self._query_for.get(timeframe)
+        if not base_query:
             print(f"[ERROR] Unsupported timeframe: {timeframe}", file=sys.stderr)
             return None
 
         # 如果需要超过300根，分批获取
         if limit > 300:
-            return self._fetch_batch(timeframe, bar, limit)
+            return self._fetch_batch(timeframe, base_query, limit)
 
         # 单次获取（≤300根）
-        return self._fetch_single(timeframe, bar, limit)
+        return self._fetch_single(timeframe, base_query, limit)
 
     def _fetch_batch(
-        self, timeframe: str, bar: str, total_limit: int
+        self, timeframe: str, base_query: str, total_limit: int
     ) -> Optional[List[Dict[str, Any]]]:
         """分批获取大量K线（>300根）"""
         print(f"[INFO] Fetching {total_limit} candles for {timeframe} in batches...", file=sys.stderr)
 
-        all_candles = []
+        batches = []  # 每批从旧到新，批次本身从新到旧
+        fetched = 0
         after = None  # OKX: after=ts 返回比 ts 更早的 K 线（往历史方向翻页）
 
-        while len(all_candles) < total_limit:
-            batch_size = min(300, total_limit - len(all_candles))
-            params = {"instId": self.symbol, "bar": bar, "limit": str(batch_size)}
+        while fetched < total_limit:
+            batch_size = min(300, total_limit - fetched)
+            query = f"{base_query}&limit={batch_size}"
 
             if after:
-                params["after"] = str(after)
-
-            url = f"{OKX_CANDLES_ENDPOINT}?{parse.urlencode(params)}"
+                query += f"&after={after}"
 
             try:
                 self._rate_limit()
-                req = request.Request(url)
-                req.add_header("User-Agent", "Mozilla/5.0")
-
-                with request.urlopen(req, timeout=10) as response:
-                    data = json.loads(response.read().decode("utf-8"))
+                data = _loads(self._http_get(query))
 
                 if data.get("code") != "0":
                     print(f"[ERROR] OKX API error: {data.get('msg')}", file=sys.stderr)
@@ -144,22 +345,14 @@ class BTCDataFetcher:
                 if not candles_raw:
                     break
 
-                for candle in candles_raw:
-                    timestamp_ms = int(candle[0])
-                    all_candles.append({
-                        "timestamp": timestamp_ms / 1000,
-                        "datetime": datetime.fromtimestamp(timestamp_ms / 1000).strftime("%Y-%m-%d %H:%M:%S"),
-                        "open": float(candle[1]),
-                        "high": float(candle[2]),
-                        "low": float(candle[3]),
-                        "close": float(candle[4]),
-                        "volume": float(candle[5]),
-                    })
+                batch = _parse_candles(candles_raw)
+                batches.append(batch)
+                fetched += len(batch)
 
                 # OKX 返回降序（最新在前），取最后一条（最早）的时间戳，用 after 继续往历史翻
                 after = int(candles_raw[-1][0])
 
-                print(f"  Progress: {len(all_candles)}/{total_limit} candles", file=sys.stderr, end="\r")
+                print(f"  Progress: {fetched}/{total_limit} candles", file=sys.stderr, end="\r")
 
                 if len(candles_raw) < batch_size:
                     break
@@ -168,33 +361,27 @@ class BTCDataFetcher:
                 print(f"\n[ERROR] Batch fetch failed: {e}", file=sys.stderr)
                 break
 
-        all_candles.reverse()
+        all_candles = [candle for batch in reversed(batches) for candle in batch]
         print(f"\n[SUCCESS] Fetched {len(all_candles)} candles for {timeframe}", file=sys.stderr)
         return all_candles
 
     def _fetch_single(
-        self, timeframe: str, bar: str, limit: int
+        self, timeframe: str, base_query: str, limit: int
     ) -> Optional[List[Dict[str, Any]]]:
         """单次获取K线（≤300根）"""
         # 限制 limit 最大值
         limit = min(limit, 300)
 
-        # 构建请求参数
-        params = {"instId": self.symbol, "bar": bar, "limit": str(limit)}
-
-        url = f"{OKX_CANDLES_ENDPOINT}?{parse.urlencode(params)}"
+        # 构建查询串
+        query = f"{base_query}&limit={limit}"
 
         print(f"[INFO] Fetching {timeframe} data from OKX...", file=sys.stderr)
-        print(f"[DEBUG] URL: {url}", file=sys.stderr)
+        if DEBUG:
+            print(f"[DEBUG] URL: {OKX_CANDLES_ENDPOINT}?{query}", file=sys.stderr)
 
         try:
             self._rate_limit()
-
-            req = request.Request(url)
-            req.add_header("User-Agent", "Mozilla/5.0")
-
-            with request.urlopen(req, timeout=10) as response:
-                data = json.loads(response.read().decode("utf-8"))
+            data = _loads(self._http_get(query))
 
             # 检查响应
             if data.get("code") != "0":
@@ -210,34 +397,8 @@ class BTCDataFetcher:
                 print(f"[WARN] No data returned for {timeframe}", file=sys.stderr)
                 return []
 
-            # 转换为标准格式
-            candles = []
-            for candle in candles_raw:
-                # OKX 格式: [timestamp, open, high, low, close, volume, volumeCcy, volumeCcyQuote, confirm]
-                try:
-                    timestamp_ms = int(candle[0])
-                    candles.append(
-                        {
-                            "timestamp": timestamp_ms / 1000,  # 转换为秒
-                            "datetime": datetime.fromtimestamp(
-                                timestamp_ms / 1000
-                            ).strftime("%Y-%m-%d %H:%M:%S"),
-                            "open": float(candle[1]),
-                            "high": float(candle[2]),
-                            "low": float(candle[3]),
-                            "close": float(candle[4]),
-                            "volume": float(candle[5]),
-                        }
-                    )
-                except (IndexError, ValueError) as e:
-                    print(
-                        f"[WARN] Failed to parse candle: {candle}, error: {e}",
-                        file=sys.stderr,
-                    )
-                    continue
-
-            # OKX 返回的数据是从新到旧，需要反转
-            candles.reverse()
+            # 转换为标准格式（从旧到新）
+            candles = _parse_candles(candles_raw)
 
             print(
                 f"[SUCCESS] Fetched {len(candles)} candles for {timeframe}",
@@ -259,7 +420,7 @@ class BTCDataFetcher:
         self, timeframes: List[str], limit: int = 100
     ) -> Dict[str, List[Dict[str, Any]]]:
         """
-        获取多个时间级别的数据
+        获取多个时间级别的数据（并发）
 
         参数：
             timeframes: 时间级别列表
@@ -268,10 +429,11 @@ class BTCDataFetcher:
         返回：
             字典，key 为时间级别，value 为 K 线数据
         """
-        results = {}
+        # 各时间级别并发请求，总耗时约等于最慢的一次往返
+        fetched = asyncio.run(self.fetch_all_async([(tf, limit) for tf in timeframes]))
 
-        for tf in timeframes:
-            candles = self.fetch_from_okx(tf, limit)
+        results = {}
+        for tf, candles in zip(timeframes, fetched):
             if candles:
                 results[tf] = candles
             else:
@@ -279,72 +441,310 @@ class BTCDataFetcher:
 
         return results
 
-    def save_to_cache(self, data: Dict[str, List[Dict[str, Any]]], filename: str):
+    async def fetch_all_async(
+        self, specs: List[Tuple[str, int]]
+    ) -> List[Optional[List[Dict[str, Any]]]]:
+        """
+        并发获取多个时间级别的数据
+
+        每个请求交给 asyncio.to_thread 执行（复用同步的 fetch_from_okx），
+        总耗时取决于最慢的一个请求而不是所有请求之和。
+
+        参数：
+            specs: [(时间级别, K 线数量), ...]
+
+        返回：
+            与 specs 顺序一致的 K 线数据列表，获取失败的位置为 None
+        """
+        return await asyncio.gather(
+            *(asyncio.to_thread(self.fetch_from_okx, tf, limit) for tf, limit in specs)
+        )
+
+    def make_envelope(
+        self,
+        result_data: Dict[str, List[Dict[str, Any]]],
+        columnar: bool = False,
+        fetch_time: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        构建输出结构（元数据 + 各时间级别数据）
+
+        参数：
+            result_data: 多时间级别数据
+            columnar: 是否把每个时间级别转换为按列存储的格式
+            fetch_time: 抓取时间（默认取当前时间），与同一次写入的缓存共用时传入
+
+        返回：
+            {"symbol", "exchange", "fetch_time", "timeframes", "data"[, "format"]}
+        """
+        envelope = {
+            "symbol": self.symbol,
+            "exchange": self.exchange,
+            "fetch_time": fetch_time or time.strftime(DATETIME_FORMAT),
+            "timeframes": list(result_data),
+            "data": (
+                {tf: _to_columns(candles) for tf, candles in result_data.items()}
+                if columnar
+                else result_data
+            ),
+        }
+        if columnar:
+            envelope["format"] = "columnar"
+        return envelope
+
+    def _cache_path(self, timeframe: str) -> str:
+        """单个时间级别的缓存文件路径（未压缩形式，压缩文件再加 .gz）"""
+        return os.path.join(CACHE_DIR, f"btc_cache_{self.symbol}_{timeframe}.json")
+
+    def save_to_cache(
+        self, timeframe: str, candles: List[Dict[str, Any]], fetch_time: Optional[str] = None
+    ):
         """
-        保存数据到缓存文件
+        保存单个时间级别的数据到缓存文件
+
+        每个 (交易对, 时间级别) 一个文件，与命令行中时间级别的组合和顺序无关。
+        缓存只供程序读取，写成紧凑 JSON 并用 gzip（level 1）压缩。
 
         参数：
-            data: 多时间级别数据
-            filename: 文件名（不含路径）
+            timeframe: 时间级别
+            candles: K 线数据
+            fetch_time: 抓取时间（默认取当前时间），与同一次输出共用时传入
         """
         os.makedirs(CACHE_DIR, exist_ok=True)
-        filepath = os.path.join(CACHE_DIR, filename)
+        filepath = self._cache_path(timeframe) + ".gz"
 
         # 添加元数据
         output = {
             "symbol": self.symbol,
             "exchange": self.exchange,
-            "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "timeframes": list(data.keys()),
-            "data": data,
+            "fetch_time": fetch_time or time.strftime(DATETIME_FORMAT),
+            "timeframe": timeframe,
+            "data": candles,
         }
 
+        # 先写临时文件再原子替换，中途中断不会留下截断的缓存
+        tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
         try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(output, f, indent=2, ensure_ascii=False)
+            with gzip.open(tmp_filepath, "wb", compresslevel=1) as f:
+                f.write(_dumps(output, compact=True))
+            os.replace(tmp_filepath, filepath)
 
             print(f"[INFO] Data saved to {filepath}", file=sys.stderr)
         except Exception as e:
             print(f"[ERROR] Failed to save cache: {e}", file=sys.stderr)
+            if os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
 
-    def load_from_cache(self, filename: str) -> Optional[Dict[str, Any]]:
+    def _fresh_cache_file(self, timeframe: str) -> Optional[str]:
         """
-        从缓存文件加载数据
+        只用 stat 判断缓存是否可用，不读取内容
+
+        优先使用 gzip 压缩的缓存，不存在时回退到未压缩的 .json。
 
         返回：
-            缓存的数据，如果文件不存在或过期则返回 None
+            未过期的缓存文件路径，不存在或已过期则返回 None
+        """
+        filepath = self._cache_path(timeframe)
+        gz_filepath = filepath + ".gz"
+
+        if os.path.exists(gz_filepath):
+            filepath = gz_filepath
+        elif not os.path.exists(filepath):
+            print(f"[INFO] Cache file not found: {gz_filepath}", file=sys.stderr)
+            return None
+
+        try:
+            age = time.time() - os.stat(filepath).st_mtime
+        except OSError as e:
+            print(f"[ERROR] Failed to load cache: {e}", file=sys.stderr)
+            return None
+
+        ttl = CACHE_TTL_SECONDS.get(timeframe, DEFAULT_CACHE_TTL_SECONDS)
+        if age > ttl:
+            print(
+                f"[INFO] Cache for {timeframe} expired ({age / 60:.1f} min old, ttl {ttl / 60:.0f} min)",
+                file=sys.stderr,
+            )
+            return None
+
+        return filepath
+
+    def load_from_cache(
+        self, timeframe: str, limit: int = 100
+    ) -> Optional[List[Dict[str, Any]]]:
         """
-        filepath = os.path.join(CACHE_DIR, filename)
+        从缓存文件加载单个时间级别的数据
 
-        if not os.path.exists(filepath):
-            print(f"[INFO] Cache file not found: {filepath}", file=sys.stderr)
+        参数：
+            timeframe: 时间级别
+            limit: 需要的 K 线数量，缓存不足时视为未命中
+
+        返回：
+            最近 limit 根 K 线，如果文件不存在、过期或数量不足则返回 None
+        """
+        # 先用文件修改时间判断是否过期，过期的缓存不必读取和解析
+        filepath = self._fresh_cache_file(timeframe)
+        if not filepath:
             return None
 
+        opener = gzip.open if filepath.endswith(".gz") else open
+
         try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            # 检查缓存时间（可选：根据时间级别设置不同的过期时间）
-            fetch_time_str = data.get("fetch_time")
-            if fetch_time_str:
-                fetch_time = datetime.strptime(fetch_time_str, "%Y-%m-%d %H:%M:%S")
-                age_minutes = (datetime.now() - fetch_time).total_seconds() / 60
-
-                # 简单策略：所有缓存 10 分钟过期
-                if age_minutes > 10:
-                    print(
-                        f"[INFO] Cache expired ({age_minutes:.1f} min old)",
-                        file=sys.stderr,
-                    )
-                    return None
+            with opener(filepath, "rb") as f:
+                candles = _loads(f.read()).get("data") or []
+
+            if len(candles) < limit:
+                print(
+                    f"[INFO] Cache for {timeframe} has {len(candles)} candles, need {limit}",
+                    file=sys.stderr,
+                )
+                return None
 
             print(f"[INFO] Loaded data from cache: {filepath}", file=sys.stderr)
-            return data
+            return candles[-limit:]
 
         except Exception as e:
             print(f"[ERROR] Failed to load cache: {e}", file=sys.stderr)
             return None
 
+    def fetch_with_cache(
+        self, timeframes: List[str], limit: int = 100
+    ) -> Tuple[Dict[str, List[Dict[str, Any]]], List[str]]:
+        """
+        优先使用缓存获取多个时间级别的数据
+
+        先只用 stat 找出缓存缺失或过期的时间级别，立即在后台线程发起网络请求；
+        同时在当前线程解析其余的缓存文件，让缓存解析与网络等待重叠。
+        缓存虽未过期但数量不足或已损坏的时间级别，最后再补一次请求。
+
+        参数：
+            timeframes: 时间级别列表
+            limit: 每个时间级别的 K 线数量
+
+        返回：
+            (数据, 新获取的时间级别列表)：数据的 key 为时间级别（保持 timeframes 的顺序），
+            value 为 K 线数据；新获取的时间级别由调用方决定是否写入缓存，
+            以便缓存与输出共用同一个 fetch_time
+        """
+        stale = [tf for tf in timeframes if not self._fresh_cache_file(tf)]
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = None
+            if stale:
+                print(
+                    f"[INFO] Fetching data for timeframes: {', '.join(stale)}",
+                    file=sys.stderr,
+                )
+                pending = executor.submit(self.fetch_multiple_timeframes, stale, limit)
+
+            for tf in timeframes:
+                if tf not in stale:
+                    cached = self.load_from_cache(tf, limit)
+                    if cached:
+                        results[tf] = cached
+
+            fetched = pending.result() if pending else {}
+
+        retry = [tf for tf in timeframes if tf not in stale and tf not in results]
+        if retry:
+            print(
+                f"[INFO] Fetching data for timeframes: {', '.join(retry)}",
+                file=sys.stderr,
+            )
+            fetched.update(self.fetch_multiple_timeframes(retry, limit))
+
+        if not fetched:
+            print(f"[INFO] Using cached data", file=sys.stderr)
+
+        results.update(fetched)
+        return {tf: results[tf] for tf in timeframes if tf in results}, list(fetched)
+
+
+def serve(fetcher: BTCDataFetcher, save_cache: bool = False):
+    """
+    常驻模式：从 stdin 逐行读取 JSON 请求，向 stdout 逐行输出 JSON 响应
+
+    请求：{"timeframes": ["1h", "4h"]（或 "1h,4h" / "all"）, "limit": 100, "format": "columnar"}
+    （format 可省略，默认逐根 K 线格式）
+    响应：与命令行一次性输出相同的结构（紧凑单行），出错时为 {"error": "..."}
+
+    进程常驻期间复用 HTTPS 连接、限速窗口和内存中的 K 线缓存，
+    调用方只需启动一次子进程，省去每次调用的解释器启动和 TLS 握手。
+
+    参数：
+        fetcher: 数据获取器
+        save_cache: 是否同时把新获取的数据写入缓存文件
+    """
+    memory_cache = {}  # {时间级别: (获取时刻, K 线数据)}
+    out = sys.stdout.buffer
+
+    print("[INFO] Serving JSONL requests on stdin", file=sys.stderr)
+
+    for line in sys.stdin.buffer:
+        if not line.strip():
+            continue
+
+        try:
+            req = _loads(line)
+            timeframes = req.get("timeframes", ["1h"])
+            if isinstance(timeframes, str):
+                # 与命令行一致：逗号分隔或 "all"
+                if timeframes.lower() == "all":
+                    timeframes = DEFAULT_TIMEFRAMES
+                else:
+                    timeframes = [tf.strip() for tf in timeframes.split(",")]
+            if not isinstance(timeframes, list) or not all(isinstance(tf, str) for tf in timeframes):
+                raise TypeError(f"timeframes must be a list of strings, got {timeframes!r}")
+            limit = int(req.get("limit", 100))
+            if limit <= 0:
+                raise ValueError(f"limit must be positive, got {limit}")
+            columnar = req.get("format") == "columnar"
+
+            # 单个错误请求只返回错误，不能让常驻进程退出
+            invalid_tf = [tf for tf in timeframes if tf not in TIMEFRAME_MAP]
+            if invalid_tf:
+                out.write(_dumps({"error": f"Invalid timeframes: {invalid_tf}"}, compact=True) + b"\n")
+                out.flush()
+                continue
+        except (ValueError, TypeError, AttributeError) as e:
+            out.write(_dumps({"error": f"Invalid request: {e}"}, compact=True) + b"\n")
+            out.flush()
+            continue
+
+        # 内存缓存命中：未过期且数量足够
+        now = time.monotonic()
+        result_data = {}
+        for tf in timeframes:
+            entry = memory_cache.get(tf)
+            ttl = CACHE_TTL_SECONDS.get(tf, DEFAULT_CACHE_TTL_SECONDS)
+            if entry and now - entry[0] <= ttl and len(entry[1]) >= limit:
+                result_data[tf] = entry[1][-limit:]
+
+        missing = [tf for tf in timeframes if tf not in result_data]
+        if missing:
+            fetched = fetcher.fetch_multiple_timeframes(missing, limit)
+            fetched_at = time.monotonic()
+            for tf, candles in fetched.items():
+                memory_cache[tf] = (fetched_at, candles)
+            result_data.update(fetched)
+        else:
+            fetched = {}
+
+        if result_data:
+            # 缓存文件与响应共用同一个 fetch_time
+            fetch_time = time.strftime(DATETIME_FORMAT)
+            if save_cache:
+                for tf, candles in fetched.items():
+                    fetcher.save_to_cache(tf, candles, fetch_time=fetch_time)
+            ordered = {tf: result_data[tf] for tf in timeframes if tf in result_data}
+            response = fetcher.make_envelope(ordered, columnar=columnar, fetch_time=fetch_time)
+        else:
+            response = {"error": "Failed to fetch data"}
+
+        out.write(_dumps(response, compact=True) + b"\n")
+        out.flush()
+
 
 def main():
     parser = argparse.ArgumentParser(description="Fetch BTC candle data from OKX API")
@@ -393,6 +793,26 @@ def main():
         help="Output filename (optional, defaults to stdout)",
     )
 
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the JSON output (default: compact)",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["records", "columnar"],
+        default="records",
+        help="records: one object per candle (default); "
+        "columnar: one array per field, e.g. {\"close\": [...]}",
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived process answering JSONL requests on stdin",
+    )
+
     args = parser.parse_args()
 
     # 解析时间级别
@@ -414,40 +834,35 @@ def main():
     # 创建数据获取器
     fetcher = BTCDataFetcher(symbol=args.symbol, exchange=args.exchange)
 
-    # 尝试从缓存加载
-    result_data = None
-    cache_filename = f"btc_cache_{'-'.join(timeframes)}.json"
+    if args.serve:
+        serve(fetcher, save_cache=args.cache)
+        return
 
     if args.use_cache:
-        cached = fetcher.load_from_cache(cache_filename)
-        if cached and cached.get("data"):
-            result_data = cached["data"]
-            print(f"[INFO] Using cached data", file=sys.stderr)
-
-    # 如果没有缓存或缓存过期，从 API 获取
-    if not result_data:
+        # 优先使用缓存，只请求缓存缺失或过期的时间级别
+        result_data, fetched_tfs = fetcher.fetch_with_cache(timeframes, args.limit)
+    else:
         print(
             f"[INFO] Fetching data for timeframes: {', '.join(timeframes)}",
             file=sys.stderr,
         )
         result_data = fetcher.fetch_multiple_timeframes(timeframes, args.limit)
+        fetched_tfs = list(result_data)
 
-        if not result_data:
-            print("[ERROR] Failed to fetch data", file=sys.stderr)
-            sys.exit(1)
+    if not result_data:
+        print("[ERROR] Failed to fetch data", file=sys.stderr)
+        sys.exit(1)
 
-        # 保存到缓存
-        if args.cache:
-            fetcher.save_to_cache(result_data, cache_filename)
+    # 抓取时间只取一次，缓存与输出共用同一个 fetch_time
+    fetch_time = time.strftime(DATETIME_FORMAT)
+    output_json = fetcher.make_envelope(
+        result_data, columnar=args.format == "columnar", fetch_time=fetch_time
+    )
 
-    # 输出结果
-    output_json = {
-        "symbol": args.symbol,
-        "exchange": args.exchange,
-        "fetch_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "timeframes": list(result_data.keys()),
-        "data": result_data,
-    }
+    # 保存到缓存（只保存本次新获取的时间级别，读自缓存的不重写）
+    if args.cache:
+        for tf in fetched_tfs:
+            fetcher.save_to_cache(tf, result_data[tf], fetch_time=fetch_time)
 
     if args.output:
         # 输出到文件
@@ -457,13 +872,13 @@ def main():
 
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(output_json, f, indent=2, ensure_ascii=False)
+        with open(output_path, "wb") as f:
+            f.write(_dumps(output_json, compact=not args.pretty))
 
         print(f"[INFO] Data written to {output_path}", file=sys.stderr)
     else:
         # 输出到 stdout
-        print(json.dumps(output_json, indent=2, ensure_ascii=False))
+        sys.stdout.buffer.write(_dumps(output_json, compact=not args.pretty) + b"\n")
 
     print(f"[INFO] Total candles fetched:", file=sys.stderr)
     for tf, candles in result_data.items():
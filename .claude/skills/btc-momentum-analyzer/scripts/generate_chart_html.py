@@ -13,12 +13,23 @@
 日期：2026-01-05
 """
 
+import base64
+import gzip
 import json
 import sys
 import os
+import subprocess
 import argparse
 from datetime import datetime
-from typing import List, Dict, Any
+from functools import lru_cache
+from itertools import compress, repeat
+from operator import itemgetter
+from typing import List, Dict, Any, Callable, Optional, Sequence
+
+try:
+    import orjson  # 可选加速：安装后数据库解析与图表数据序列化走 orjson，否则回退到标准库 json
+except ImportError:
+    orjson = None
 
 # 导入交易信号模块
 sys.path.insert(0, os.path.dirname(__file__))
@@ -27,11 +38,57 @@ from trading_signals import analyze_trading_signals, generate_trading_plan
 # 数据库路径
 DATABASE_FILE = "/Users/adrian/Desktop/BA/MACD/data/database/btc_database.json"
 
+# 写 HTML 时的文件缓冲区大小（1 MiB），报告分段写入时减少系统调用
+WRITE_BUFFER_SIZE = 1 << 20
+
+# 每个时间级别展示的K线数量
+DISPLAY_CANDLES = 200
+
+# 图表用到的K线字段（build_chart_series 按此顺序拆列）
+CHART_FIELDS = ('datetime', 'open', 'high', 'low', 'close', 'dif', 'dea', 'histogram', 'ema26', 'ema52')
+
+
+def dumps_compact(data: Any) -> str:
+    """序列化为紧凑 JSON（无缩进和多余空格，非 ASCII 字符原样输出）"""
+    if orjson:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+
+
+def encode_chart_payload(data: Any) -> str:
+    """
+    把图表数据编码为内嵌到 HTML 的字符串：紧凑 JSON → gzip → base64
+
+    数值为主的 JSON 压缩率很高，base64 膨胀 1/3 后仍远小于原文。
+    gzip 头部时间戳固定为 0，相同数据生成相同的报告内容。
+
+    参数：
+        data: 图表数据
+
+    返回：
+        base64 字符串（ASCII，可直接放入 JS 字符串字面量）
+    """
+    raw = dumps_compact(data).encode('utf-8')
+    return base64.b64encode(gzip.compress(raw, mtime=0)).decode('ascii')
+
+
+@lru_cache(maxsize=1)
+def _load_database_file(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    """按 (路径, 修改时间, 大小) 缓存的数据库解析结果"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
 
 def load_database() -> Dict[str, Any]:
-    """加载数据库"""
-    with open(DATABASE_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """
+    加载数据库（按字节整体读入后一次解析，有 orjson 时走 orjson）
+
+    文件未变化时直接复用上次的解析结果，同一进程内多次生成报告只解析一次；
+    返回的字典是共享的，调用方不应修改。
+    """
+    st = os.stat(DATABASE_FILE)
+    return _load_database_file(DATABASE_FILE, st.st_mtime_ns, st.st_size)
 
 
 def generate_trading_analysis(db: Dict[str, Any]) -> Dict[str, Any]:
@@ -41,106 +98,100 @@ def generate_trading_analysis(db: Dict[str, Any]) -> Dict[str, Any]:
     严格按照THEORY.md中定义的买卖点规则判断进场信号
     使用trading_signals.py模块进行严格检测
     """
-    # 获取关键时间级别数据
+    # 获取关键时间级别数据（各级别最新K线的指标只取一次）
     tf_2d = db['timeframes']['2d']['candles'][-1]
     tf_1d = db['timeframes']['1d']['candles'][-1]
     tf_12h = db['timeframes']['12h']['candles'][-1]
     tf_4h = db['timeframes']['4h']['candles'][-1]
-    tf_1h = db['timeframes']['1h']['candles'][-1]
+
+    dea_2d, ema52_2d = tf_2d['dea'], tf_2d['ema52']
+    dea_12h, ema52_12h = tf_12h['dea'], tf_12h['ema52']
+    dea_4h, ema52_4h = tf_4h['dea'], tf_4h['ema52']
+    ema52_1d = tf_1d['ema52']
 
     current_price = tf_1d['close']
 
     # 判断市场状态
-    large_trend = "下跌" if tf_2d['dea'] < 0 else "上涨"
-    mid_trend = "上涨" if tf_12h['dea'] > 0 else "下跌"
-    small_trend = "上涨" if tf_4h['dea'] > 0 else "下跌"
+    large_trend = "下跌" if dea_2d < 0 else "上涨"
+    mid_trend = "上涨" if dea_12h > 0 else "下跌"
+    small_trend = "上涨" if dea_4h > 0 else "下跌"
+
+    def has_signal(plan: Dict[str, Any]) -> bool:
+        return plan['direction'] in ('做多', '做空')
+
+    def ema52_gap_pct(close: float, ema52: float) -> float:
+        return (close - ema52) / ema52 * 100
 
     # ==== 3日交易计划（基于4h/1h） ====
-    # 优先检测4h级别信号，如无信号则检测1h级别
-    day3_plan_4h = generate_trading_plan(db, '4h')
-    day3_plan_1h = generate_trading_plan(db, '1h')
-
-    # 优先使用4h级别信号（更可靠）
-    if day3_plan_4h['direction'] in ['做多', '做空']:
-        day3_plan = day3_plan_4h
-        day3_plan['timeframe'] = '4h'
-    elif day3_plan_1h['direction'] in ['做多', '做空']:
-        day3_plan = day3_plan_1h
+    # 优先使用4h级别信号（更可靠），4h无信号时才检测1h级别
+    day3_plan = generate_trading_plan(db, '4h')
+    day3_plan['timeframe'] = '4h'
+    if not has_signal(day3_plan):
+        day3_plan = generate_trading_plan(db, '1h')
         day3_plan['timeframe'] = '1h'
-    else:
+
+    if not has_signal(day3_plan):
         # 无信号，观望
         day3_plan = {
             'direction': '观望',
             'timeframe': '4h',
             'entry': None,
-            'stop_loss': tf_4h['ema52'] - 300,
+            'stop_loss': ema52_4h - 300,
             'target1': None,
             'target2': None,
-            'reason': f"等待买卖点信号 (4h DEA={tf_4h['dea']:.0f}, 价格距EMA52={(tf_4h['close']-tf_4h['ema52'])/tf_4h['ema52']*100:+.1f}%)",
+            'reason': f"等待买卖点信号 (4h DEA={dea_4h:.0f}, 价格距EMA52={ema52_gap_pct(tf_4h['close'], ema52_4h):+.1f}%)",
             'buy_point_type': None
         }
 
     # ==== 1周交易计划（基于12h/1d） ====
-    week_plan_12h = generate_trading_plan(db, '12h')
-    week_plan_1d = generate_trading_plan(db, '1d')
+    # 优先使用12h级别信号，12h无信号时才检测1d级别
+    week_plan = generate_trading_plan(db, '12h')
+    week_plan['timeframe'] = '12h'
+    if not has_signal(week_plan):
+        week_plan = generate_trading_plan(db, '1d')
+        week_plan['timeframe'] = '1d'
 
-    # 优先使用12h级别信号
-    if week_plan_12h['direction'] in ['做多', '做空']:
-        week_plan = week_plan_12h
-        week_plan['timeframe'] = '12h'
+    if has_signal(week_plan):
         # 转换为entry_zone格式
-        if week_plan['entry']:
-            entry_low = week_plan['entry'] * 0.98
-            entry_high = week_plan['entry'] * 1.02
-            week_plan['entry_zone'] = f"{entry_low:,.0f}-{entry_high:,.0f}"
-        else:
-            week_plan['entry_zone'] = "等待信号"
-    elif week_plan_1d['direction'] in ['做多', '做空']:
-        week_plan = week_plan_1d
-        week_plan['timeframe'] = '1d'
-        if week_plan['entry']:
-            entry_low = week_plan['entry'] * 0.98
-            entry_high = week_plan['entry'] * 1.02
-            week_plan['entry_zone'] = f"{entry_low:,.0f}-{entry_high:,.0f}"
-        else:
-            week_plan['entry_zone'] = "等待信号"
+        entry = week_plan['entry']
+        week_plan['entry_zone'] = f"{entry * 0.98:,.0f}-{entry * 1.02:,.0f}" if entry else "等待信号"
     else:
         # 无信号，观望
         week_plan = {
             'direction': '观望',
             'timeframe': '12h',
             'entry_zone': "等待信号",
-            'stop_loss': tf_1d['ema52'] - 500,
+            'stop_loss': ema52_1d - 500,
             'target1': None,
             'target2': None,
-            'reason': f"等待买卖点信号 (12h DEA={tf_12h['dea']:.0f}, 价格距EMA52={(tf_12h['close']-tf_12h['ema52'])/tf_12h['ema52']*100:+.1f}%)",
+            'reason': f"等待买卖点信号 (12h DEA={dea_12h:.0f}, 价格距EMA52={ema52_gap_pct(tf_12h['close'], ema52_12h):+.1f}%)",
             'buy_point_type': None
         }
 
     # ==== 1月交易计划（基于2d） ====
     month_plan_2d = generate_trading_plan(db, '2d')
 
-    if month_plan_2d['direction'] in ['做多', '做空']:
+    if has_signal(month_plan_2d):
         month_plan = month_plan_2d
         month_plan['timeframe'] = '2d'
         month_plan['entry_condition'] = f"{month_plan_2d.get('buy_point_type', month_plan_2d.get('sell_point_type', '信号确认'))}"
         month_plan['target'] = month_plan['target2'] if month_plan['target2'] else month_plan['target1']
     else:
         # 无信号，观望
-        if tf_2d['dea'] < -1000:
+        if dea_2d < -1000:
             direction = '等待'
             entry_condition = "2d DEA上穿0轴确认"
-            reason = f"2d下跌线段，DEA={tf_2d['dea']:.0f}，等待变盘"
+            reason = f"2d下跌线段，DEA={dea_2d:.0f}，等待变盘"
         else:
             direction = '谨慎观望'
             entry_condition = "等待买点信号"
-            reason = f"2d 未出现明确买卖点 (DEA={tf_2d['dea']:.0f}, 价格距EMA52={(tf_2d['close']-tf_2d['ema52'])/tf_2d['ema52']*100:+.1f}%)"
+            reason = f"2d 未出现明确买卖点 (DEA={dea_2d:.0f}, 价格距EMA52={ema52_gap_pct(tf_2d['close'], ema52_2d):+.1f}%)"
 
         month_plan = {
             'direction': direction,
             'timeframe': '2d',
             'entry_condition': entry_condition,
-            'stop_loss': tf_2d['ema52'] - 1000,
+            'stop_loss': ema52_2d - 1000,
             'target': None,
             'reason': reason,
             'buy_point_type': None
@@ -157,6 +208,771 @@ def generate_trading_analysis(db: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def valid_rows(*columns: Sequence[Optional[float]]) -> Callable[[Sequence[Any]], Sequence[Any]]:
+    """
+    返回挑选函数：从等长的列中取出给定指标列全部非 None 的行
+
+    指标的 None 只出现在开头的预热期，通常只需按预热期长度切片一次，
+    不必逐行判断；若预热期之后仍有 None，则退回按掩码挑选。
+
+    参数：
+        columns: 用于判断有效性的指标列
+
+    返回：
+        接受任意等长列、返回其有效行的函数
+    """
+    start = max(next((i for i, v in enumerate(col) if v is not None), len(col)) for col in columns)
+    if not any(None in col[start:] for col in columns):
+        return lambda column: column[start:]
+
+    mask = [all(v is not None for v in values) for values in zip(*columns)]
+    return lambda column: list(compress(column, mask))
+
+
+def build_chart_series(display_candles: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    把K线转换为列式图表序列（时间使用 YYYY-MM-DD 字符串）
+
+    先一次遍历把K线拆成按字段的列（日期也只切分一次），各序列直接由列切片
+    得到，不再为每个点生成字典；浏览器端再把列还原为图表库需要的点对象。
+    列式 JSON 比逐点对象少了重复的键名，压缩后体积约小三分之一。
+
+    参数：
+        display_candles: 用于展示的K线（已带指标）
+
+    返回：
+        {'candlestick': {'time', 'open', 'high', 'low', 'close'},
+         'dif' / 'dea' / 'histogram' / 'ema26' / 'ema52': {'time', 'value'}}
+    """
+    if not display_candles:
+        return {
+            'candlestick': {key: [] for key in ('time', 'open', 'high', 'low', 'close')},
+            **{key: {'time': [], 'value': []} for key in ('dif', 'dea', 'histogram', 'ema26', 'ema52')},
+        }
+
+    # 按字段拆列（itemgetter 在 C 层一次取出一根K线的全部字段）
+    rows = map(itemgetter(*CHART_FIELDS), display_candles)
+    datetimes, opens, highs, lows, closes, difs, deas, histograms, ema26s, ema52s = zip(*rows)
+    dates = [dt[:10] for dt in datetimes]  # "YYYY-MM-DD HH:MM:SS" 定宽，直接切片取日期
+
+    # 各序列只保留对应指标已有值的K线
+    with_ema26 = valid_rows(ema26s)
+    with_macd = valid_rows(difs, deas)
+    with_ema52 = valid_rows(ema52s)
+
+    # 整列保留两位小数（map 在 C 层逐个调用 round）
+    def rounded(column):
+        return list(map(round, column, repeat(2)))
+
+    # K线与 EMA26 共用同一组有效日期
+    ema26_dates = with_ema26(dates)
+    macd_dates = with_macd(dates)
+
+    return {
+        'candlestick': {
+            'time': ema26_dates,
+            'open': rounded(with_ema26(opens)),
+            'high': rounded(with_ema26(highs)),
+            'low': rounded(with_ema26(lows)),
+            'close': rounded(with_ema26(closes)),
+        },
+        'dif': {'time': macd_dates, 'value': rounded(with_macd(difs))},
+        'dea': {'time': macd_dates, 'value': rounded(with_macd(deas))},
+        'histogram': {'time': macd_dates, 'value': rounded(with_macd(histograms))},
+        'ema26': {'time': ema26_dates, 'value': rounded(with_ema26(ema26s))},
+        'ema52': {'time': with_ema52(dates), 'value': rounded(with_ema52(ema52s))},
+    }
+
+
+def analyze_momentum(candles: List[Dict[str, Any]]) -> List[str]:
+    """
+    生成动能分析文本（线段、柱状图趋势、价格与EMA52、DEA位置）
+
+    只读取最后几根K线的少量数值，各结论按顺序追加。
+
+    参数：
+        candles: 该级别的全部K线（已带指标）
+
+    返回：
+        分析结论列表
+    """
+    last = candles[-1]
+    dea, close, ema52 = last['dea'], last['close'], last['ema52']
+
+    momentum_analysis = []
+
+    # 线段分析
+    segment_type = "上涨线段" if dea > 0 else "下跌线段"
+    momentum_analysis.append(f"当前处于{segment_type}，DEA={dea:.2f}")
+
+    # 柱状图趋势分析（最近三根的柱值一次取出，h1 为最新）
+    if len(candles) >= 3:
+        h3, h2, h1 = [c['histogram'] for c in candles[-3:]]
+        if h1 and h2 and h3:
+            if h3 < h2 < h1:
+                momentum_analysis.append("柱状图连续跳空扩张，动能增强")
+            elif h3 > h2 > h1:
+                momentum_analysis.append("柱状图连续收缩，动能减弱")
+            elif abs(h1) < abs(h2):
+                momentum_analysis.append("柱状图收缩中，注意变盘")
+
+    # 价格与EMA52关系
+    price_ema_diff = close - ema52
+    price_ema_pct = (price_ema_diff / ema52) * 100
+    if abs(price_ema_pct) < 2:
+        momentum_analysis.append(f"价格接近EMA52（{price_ema_pct:+.1f}%），归零轴状态")
+    elif price_ema_diff > 0:
+        momentum_analysis.append(f"价格在EMA52上方{price_ema_diff:.0f}点")
+    else:
+        momentum_analysis.append(f"价格在EMA52下方{abs(price_ema_diff):.0f}点")
+
+    # DEA位置判断
+    if abs(dea) < 100:
+        momentum_analysis.append("DEA接近0轴，关注穿零轴信号")
+    elif dea > 500:
+        momentum_analysis.append("DEA较高，上涨动能充足")
+    elif dea < -500:
+        momentum_analysis.append("DEA较低，下跌动能较强")
+
+    return momentum_analysis
+
+
+def build_timeframe_chart_data(candles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    构建单个时间级别的图表数据（各级别互不依赖）
+
+    参数：
+        candles: 该级别的全部K线（已带指标）
+
+    返回：
+        图表序列 + 动能分析 + 最新数据
+    """
+    # 最新数据
+    last = candles[-1]
+
+    return {
+        # 取最近 DISPLAY_CANDLES 根K线用于展示
+        **build_chart_series(candles[-DISPLAY_CANDLES:]),
+        'momentum_analysis': analyze_momentum(candles),
+        'latest': {
+            'datetime': last['datetime'],
+            'close': last['close'],
+            'dif': last['dif'],
+            'dea': last['dea'],
+            'histogram': last['histogram'],
+            'ema26': last['ema26'],
+            'ema52': last['ema52'],
+            'segment': '上涨线段 ↑' if last['dea'] > 0 else '下跌线段 ↓'
+        }
+    }
+
+
+# ---- HTML 模板：模块加载时构建一次，生成报告时只做 format 填充 ----
+
+# 报告样式表：写到 HTML 旁边的静态文件，各报告共用，浏览器可缓存
+STYLESHEET_FILE = "btc_momentum_report.css"
+
+REPORT_CSS = """* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+
+body {
+    background: linear-gradient(135deg, #0a0a0a 0%, #1a1a1a 100%);
+    color: #e0e0e0;
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
+    padding: 20px;
+    min-height: 100vh;
+}
+
+.header {
+    text-align: center;
+    padding: 30px 0;
+    background: rgba(20, 20, 20, 0.6);
+    backdrop-filter: blur(10px);
+    border-radius: 20px;
+    margin-bottom: 30px;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+}
+
+.header h1 {
+    font-size: 2.5em;
+    background: linear-gradient(90deg, #00ff88 0%, #00cc66 100%);
+    -webkit-background-clip: text;
+    -webkit-text-fill-color: transparent;
+    margin-bottom: 10px;
+}
+
+.header .subtitle {
+    color: #888;
+    font-size: 1em;
+}
+
+.trading-plans {
+    display: grid;
+    grid-template-columns: repeat(3, 1fr);
+    gap: 20px;
+    margin-bottom: 30px;
+}
+
+.plan-card {
+    background: rgba(20, 20, 20, 0.6);
+    backdrop-filter: blur(10px);
+    border-radius: 20px;
+    padding: 25px;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+}
+
+.plan-header {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    margin-bottom: 20px;
+    padding-bottom: 15px;
+    border-bottom: 2px solid rgba(0, 255, 136, 0.3);
+}
+
+.plan-title {
+    font-size: 1.5em;
+    color: #00ff88;
+    font-weight: 600;
+}
+
+.plan-direction {
+    padding: 5px 15px;
+    border-radius: 10px;
+    font-weight: 600;
+    font-size: 0.9em;
+}
+
+.plan-direction.long {
+    background: rgba(0, 255, 136, 0.2);
+    color: #00ff88;
+}
+
+.plan-direction.short {
+    background: rgba(255, 68, 102, 0.2);
+    color: #ff4466;
+}
+
+.plan-direction.wait {
+    background: rgba(255, 187, 0, 0.2);
+    color: #ffbb00;
+}
+
+.plan-item {
+    margin-bottom: 15px;
+}
+
+.plan-label {
+    color: #666;
+    font-size: 0.85em;
+    margin-bottom: 5px;
+}
+
+.plan-value {
+    color: #e0e0e0;
+    font-size: 1.1em;
+    font-weight: 600;
+}
+
+.plan-value.price {
+    color: #00ff88;
+    font-size: 1.3em;
+}
+
+.plan-reason {
+    margin-top: 15px;
+    padding: 12px;
+    background: rgba(255, 255, 255, 0.03);
+    border-radius: 10px;
+    font-size: 0.9em;
+    color: #999;
+    line-height: 1.5;
+}
+
+@media (max-width: 1200px) {
+    .trading-plans {
+        grid-template-columns: 1fr;
+    }
+}
+
+.timeframe-section {
+    margin-bottom: 40px;
+    background: rgba(20, 20, 20, 0.6);
+    backdrop-filter: blur(10px);
+    border-radius: 20px;
+    padding: 25px;
+    border: 1px solid rgba(255, 255, 255, 0.1);
+}
+
+.timeframe-header {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+    margin-bottom: 20px;
+    padding-bottom: 15px;
+    border-bottom: 2px solid rgba(0, 255, 136, 0.3);
+}
+
+.timeframe-title {
+    font-size: 1.8em;
+    color: #00ff88;
+    font-weight: 600;
+}
+
+.timeframe-info {
+    display: flex;
+    gap: 30px;
+    font-size: 0.95em;
+}
+
+.info-item {
+    display: flex;
+    flex-direction: column;
+    align-items: flex-end;
+}
+
+.info-label {
+    color: #666;
+    font-size: 0.85em;
+    margin-bottom: 3px;
+}
+
+.info-value {
+    color: #e0e0e0;
+    font-weight: 600;
+}
+
+.info-value.positive {
+    color: #00ff88;
+}
+
+.info-value.negative {
+    color: #ff4466;
+}
+
+.charts-container {
+    display: grid;
+    grid-template-columns: 1fr 300px;
+    gap: 20px;
+}
+
+.charts-main {
+    display: flex;
+    flex-direction: column;
+    gap: 15px;
+}
+
+.chart-wrapper {
+    background: rgba(10, 10, 10, 0.8);
+    border-radius: 15px;
+    padding: 15px;
+    border: 1px solid rgba(255, 255, 255, 0.05);
+}
+
+.chart-title {
+    color: #888;
+    font-size: 0.9em;
+    margin-bottom: 10px;
+    font-weight: 500;
+}
+
+.analysis-panel {
+    background: rgba(10, 10, 10, 0.8);
+    border-radius: 15px;
+    padding: 20px;
+    border: 1px solid rgba(255, 255, 255, 0.05);
+}
+
+.analysis-title {
+    color: #00ff88;
+    font-size: 1.1em;
+    margin-bottom: 15px;
+    font-weight: 600;
+}
+
+.signal-item {
+    padding: 12px;
+    margin-bottom: 10px;
+    border-radius: 10px;
+    background: rgba(0, 255, 136, 0.1);
+    border-left: 3px solid #00ff88;
+}
+
+.signal-item.sell {
+    background: rgba(255, 68, 102, 0.1);
+    border-left-color: #ff4466;
+}
+
+.signal-label {
+    color: #00ff88;
+    font-size: 0.85em;
+    margin-bottom: 5px;
+}
+
+.signal-item.sell .signal-label {
+    color: #ff4466;
+}
+
+.signal-value {
+    color: #e0e0e0;
+    font-size: 1.05em;
+    font-weight: 500;
+}
+
+.metric-grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 10px;
+    margin-top: 15px;
+}
+
+.metric-item {
+    background: rgba(255, 255, 255, 0.03);
+    padding: 10px;
+    border-radius: 8px;
+}
+
+.metric-label {
+    color: #666;
+    font-size: 0.8em;
+    margin-bottom: 3px;
+}
+
+.metric-value {
+    color: #e0e0e0;
+    font-size: 1em;
+    font-weight: 600;
+}
+
+@media (max-width: 1200px) {
+    .charts-container {
+        grid-template-columns: 1fr;
+    }
+}
+"""
+
+# 页面头部，占位符：title_time、stylesheet
+HTML_HEAD_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>BTC 动能分析报告 - {title_time}</title>
+    <script src="https://unpkg.com/lightweight-charts/dist/lightweight-charts.standalone.production.js"></script>
+    <link rel="stylesheet" href="{stylesheet}">
+</head>
+"""
+
+# 每个时间级别的图表区块，占位符来自该级别的 latest 数据
+TIMEFRAME_SECTION_TEMPLATE = """
+    <div class="timeframe-section">
+        <div class="timeframe-header">
+            <div class="timeframe-title">{tf_title} 级别</div>
+            <div class="timeframe-info">
+                <div class="info-item">
+                    <div class="info-label">最新时间</div>
+                    <div class="info-value">{datetime}</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">收盘价</div>
+                    <div class="info-value">{close:.2f}</div>
+                </div>
+                <div class="info-item">
+                    <div class="info-label">线段状态</div>
+                    <div class="info-value {dea_color}">{segment}</div>
+                </div>
+            </div>
+        </div>
+
+        <div class="charts-container">
+            <div class="charts-main">
+                <div class="chart-wrapper">
+                    <div class="chart-title">K线图 + EMA26/52</div>
+                    <div id="candlestick-{tf}" style="height: 400px;"></div>
+                </div>
+
+                <div class="chart-wrapper">
+                    <div class="chart-title">MACD 指标</div>
+                    <div id="macd-{tf}" style="height: 200px;"></div>
+                </div>
+            </div>
+
+            <div class="analysis-panel">
+                <div class="analysis-title">技术指标</div>
+
+                <div class="metric-grid">
+                    <div class="metric-item">
+                        <div class="metric-label">EMA26</div>
+                        <div class="metric-value">{ema26:.2f}</div>
+                    </div>
+                    <div class="metric-item">
+                        <div class="metric-label">EMA52</div>
+                        <div class="metric-value">{ema52:.2f}</div>
+                    </div>
+                    <div class="metric-item">
+                        <div class="metric-label">DIF (黄线)</div>
+                        <div class="metric-value">{dif:.2f}</div>
+                    </div>
+                    <div class="metric-item">
+                        <div class="metric-label">DEA (白线)</div>
+                        <div class="metric-value {dea_color}">{dea:.2f}</div>
+                    </div>
+                    <div class="metric-item" style="grid-column: 1 / -1;">
+                        <div class="metric-label">Histogram</div>
+                        <div class="metric-value {hist_color}">{histogram:.2f}</div>
+                    </div>
+                </div>
+
+                <div style="margin-top: 20px;">
+                    <div class="analysis-title" style="font-size: 0.95em;">动能分析</div>
+                    {momentum_items}
+                </div>
+
+                <div style="margin-top: 15px;">
+                    <div class="analysis-title" style="font-size: 0.95em;">关键位置</div>
+                    <div class="signal-item">
+                        <div class="signal-label">当前价格</div>
+                        <div class="signal-value">{close:.2f} USDT</div>
+                    </div>
+                    <div class="signal-item">
+                        <div class="signal-label">支撑位 (EMA52)</div>
+                        <div class="signal-value">{ema52:.2f}</div>
+                    </div>
+                    <div class="signal-item sell">
+                        <div class="signal-label">止损参考 (EMA52-300)</div>
+                        <div class="signal-value">{stop_reference:.2f}</div>
+                    </div>
+                </div>
+            </div>
+        </div>
+    </div>
+"""
+
+# 动能分析条目
+MOMENTUM_ITEM_TEMPLATE = '<div class="signal-item"><div class="signal-value" style="font-size: 0.9em;">{analysis}</div></div>'
+
+# chartsDataRaw 之后的解压与图表渲染脚本（纯静态）
+CHART_SCRIPT = """\";
+
+        // 解压内嵌的图表数据：base64 → gzip 字节 → 浏览器原生 DecompressionStream → JSON
+        async function loadChartsData(raw) {
+            const bytes = Uint8Array.from(atob(raw), c => c.charCodeAt(0));
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+            return new Response(stream).json();
+        }
+
+        // 列式序列 → Lightweight Charts 需要的点对象
+        function toPoints(series) {
+            return series.time.map((time, i) => ({ time, value: series.value[i] }));
+        }
+
+        function toCandles(series) {
+            return series.time.map((time, i) => ({
+                time,
+                open: series.open[i],
+                high: series.high[i],
+                low: series.low[i],
+                close: series.close[i]
+            }));
+        }
+
+        // Histogram颜色（四舍五入成 -0 的微小负值仍按负值着色）
+        function toHistogram(series) {
+            return series.time.map((time, i) => {
+                const value = series.value[i];
+                const color = value < 0 || Object.is(value, -0) ? '#ff4466' : '#00ff88';
+                return { time, value, color };
+            });
+        }
+
+        loadChartsData(chartsDataRaw).then(chartsData => {
+            // 创建图表
+            Object.keys(chartsData).forEach(tf => {
+                const data = chartsData[tf];
+
+                // K线图
+                const candlestickChart = LightweightCharts.createChart(
+                    document.getElementById(`candlestick-${tf}`),
+                    {
+                        layout: {
+                            background: { color: '#0a0a0a' },
+                            textColor: '#888',
+                        },
+                        grid: {
+                            vertLines: { color: 'rgba(255, 255, 255, 0.05)' },
+                            horzLines: { color: 'rgba(255, 255, 255, 0.05)' },
+                        },
+                        crosshair: {
+                            mode: LightweightCharts.CrosshairMode.Normal,
+                        },
+                        rightPriceScale: {
+                            borderColor: 'rgba(255, 255, 255, 0.1)',
+                        },
+                        timeScale: {
+                            borderColor: 'rgba(255, 255, 255, 0.1)',
+                            timeVisible: true,
+                        },
+                    }
+                );
+
+                const candlestickSeries = candlestickChart.addCandlestickSeries({
+                    upColor: '#00ff88',
+                    downColor: '#ff4466',
+                    borderUpColor: '#00ff88',
+                    borderDownColor: '#ff4466',
+                    wickUpColor: '#00ff88',
+                    wickDownColor: '#ff4466',
+                });
+                candlestickSeries.setData(toCandles(data.candlestick));
+
+                // EMA26
+                const ema26Series = candlestickChart.addLineSeries({
+                    color: '#ffa500',
+                    lineWidth: 2,
+                    title: 'EMA26',
+                });
+                ema26Series.setData(toPoints(data.ema26));
+
+                // EMA52
+                const ema52Series = candlestickChart.addLineSeries({
+                    color: '#00ccff',
+                    lineWidth: 2,
+                    title: 'EMA52',
+                });
+                ema52Series.setData(toPoints(data.ema52));
+
+                // MACD图
+                const macdChart = LightweightCharts.createChart(
+                    document.getElementById(`macd-${tf}`),
+                    {
+                        layout: {
+                            background: { color: '#0a0a0a' },
+                            textColor: '#888',
+                        },
+                        grid: {
+                            vertLines: { color: 'rgba(255, 255, 255, 0.05)' },
+                            horzLines: { color: 'rgba(255, 255, 255, 0.05)' },
+                        },
+                        crosshair: {
+                            mode: LightweightCharts.CrosshairMode.Normal,
+                        },
+                        rightPriceScale: {
+                            borderColor: 'rgba(255, 255, 255, 0.1)',
+                        },
+                        timeScale: {
+                            borderColor: 'rgba(255, 255, 255, 0.1)',
+                            timeVisible: true,
+                        },
+                    }
+                );
+
+                // Histogram
+                const histogramSeries = macdChart.addHistogramSeries({
+                    priceFormat: {
+                        type: 'price',
+                    },
+                });
+                histogramSeries.setData(toHistogram(data.histogram));
+
+                // DIF (黄线)
+                const difSeries = macdChart.addLineSeries({
+                    color: '#ffeb3b',
+                    lineWidth: 2,
+                    title: 'DIF',
+                });
+                difSeries.setData(toPoints(data.dif));
+
+                // DEA (白线)
+                const deaSeries = macdChart.addLineSeries({
+                    color: '#ffffff',
+                    lineWidth: 2,
+                    title: 'DEA',
+                });
+                deaSeries.setData(toPoints(data.dea));
+
+                // 同步时间轴
+                candlestickChart.timeScale().subscribeVisibleLogicalRangeChange(range => {
+                    macdChart.timeScale().setVisibleLogicalRange(range);
+                });
+
+                macdChart.timeScale().subscribeVisibleLogicalRangeChange(range => {
+                    candlestickChart.timeScale().setVisibleLogicalRange(range);
+                });
+
+                // 自适应大小
+                window.addEventListener('resize', () => {
+                    candlestickChart.applyOptions({
+                        width: document.getElementById(`candlestick-${tf}`).clientWidth
+                    });
+                    macdChart.applyOptions({
+                        width: document.getElementById(`macd-${tf}`).clientWidth
+                    });
+                });
+            });
+        });
+    </script>
+</body>
+</html>
+"""
+
+
+def write_stylesheet(output_dir: str) -> str:
+    """
+    在输出目录写入报告样式表（内容未变化时跳过写入）
+
+    参数：
+        output_dir: HTML 报告所在目录
+
+    返回：
+        样式表文件路径
+    """
+    css_path = os.path.join(output_dir, STYLESHEET_FILE)
+    css_bytes = REPORT_CSS.encode('utf-8')
+    try:
+        with open(css_path, 'rb') as f:
+            if f.read() == css_bytes:
+                return css_path
+    except OSError:
+        pass
+
+    with open(css_path, 'wb') as f:
+        f.write(css_bytes)
+    return css_path
+
+
+def render_timeframe_section(tf: str, data: Dict[str, Any]) -> str:
+    """
+    渲染单个时间级别的图表区块HTML
+
+    参数：
+        tf: 时间级别
+        data: 该级别的图表数据（build_timeframe_chart_data 的结果）
+
+    返回：
+        区块HTML
+    """
+    latest = data['latest']
+
+    # 判断颜色
+    dea_color = 'positive' if latest['dea'] > 0 else 'negative'
+    hist_color = 'positive' if latest['histogram'] > 0 else 'negative'
+
+    return TIMEFRAME_SECTION_TEMPLATE.format_map({
+        **latest,
+        'tf': tf,
+        'tf_title': tf.upper(),
+        'dea_color': dea_color,
+        'hist_color': hist_color,
+        'stop_reference': latest['ema52'] - 300,
+        'momentum_items': ''.join(
+            MOMENTUM_ITEM_TEMPLATE.format(analysis=analysis) for analysis in data['momentum_analysis']
+        ),
+    })
+
+
 def generate_html(timeframes: List[str], output_file: str, analysis_text: str = None):
     """
     生成HTML图表文件
@@ -168,6 +984,9 @@ def generate_html(timeframes: List[str], output_file: str, analysis_text: str =
     """
     db = load_database()
 
+    # 生成时间只取一次，标题与副标题一致
+    generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
     # 生成交易分析
     trading_analysis = generate_trading_analysis(db)
 
@@ -178,420 +997,18 @@ def generate_html(timeframes: List[str], output_file: str, analysis_text: str =
             print(f"[WARN] {tf} not in database", file=sys.stderr)
             continue
 
-        candles = db['timeframes'][tf]['candles']
-
-        # 取最近200根K线用于展示
-        display_candles = candles[-200:]
-
-        # 准备K线数据（使用字符串日期格式）
-        candlestick_data = []
-        for c in display_candles:
-            if c['ema26'] is not None:  # 确保有指标数据
-                # 转换为YYYY-MM-DD格式
-                date_str = c['datetime'].split(' ')[0]
-                candlestick_data.append({
-                    'time': date_str,
-                    'open': round(c['open'], 2),
-                    'high': round(c['high'], 2),
-                    'low': round(c['low'], 2),
-                    'close': round(c['close'], 2)
-                })
-
-        # 准备MACD数据
-        dif_data = []
-        dea_data = []
-        histogram_data = []
-
-        for c in display_candles:
-            if c['dif'] is not None and c['dea'] is not None:
-                date_str = c['datetime'].split(' ')[0]
-                dif_data.append({
-                    'time': date_str,
-                    'value': round(c['dif'], 2)
-                })
-                dea_data.append({
-                    'time': date_str,
-                    'value': round(c['dea'], 2)
-                })
-
-                # Histogram颜色
-                color = '#00ff88' if c['histogram'] >= 0 else '#ff4466'
-                histogram_data.append({
-                    'time': date_str,
-                    'value': round(c['histogram'], 2),
-                    'color': color
-                })
-
-        # 准备EMA数据
-        ema26_data = []
-        ema52_data = []
-        for c in display_candles:
-            date_str = c['datetime'].split(' ')[0]
-            if c['ema26'] is not None:
-                ema26_data.append({
-                    'time': date_str,
-                    'value': round(c['ema26'], 2)
-                })
-            if c['ema52'] is not None:
-                ema52_data.append({
-                    'time': date_str,
-                    'value': round(c['ema52'], 2)
-                })
-
-        # 最新数据
-        last = candles[-1]
-
-        # 生成动能分析文本
-        momentum_analysis = []
-
-        # 线段分析
-        segment_type = "上涨线段" if last['dea'] > 0 else "下跌线段"
-        momentum_analysis.append(f"当前处于{segment_type}，DEA={last['dea']:.2f}")
-
-        # 柱状图趋势分析
-        if len(candles) >= 3:
-            h1, h2, h3 = candles[-1]['histogram'], candles[-2]['histogram'], candles[-3]['histogram']
-            if h1 and h2 and h3:
-                if h1 > h2 and h2 > h3:
-                    momentum_analysis.append("柱状图连续跳空扩张，动能增强")
-                elif h1 < h2 and h2 < h3:
-                    momentum_analysis.append("柱状图连续收缩，动能减弱")
-                elif abs(h1) < abs(h2):
-                    momentum_analysis.append("柱状图收缩中，注意变盘")
-
-        # 价格与EMA52关系
-        price_ema_diff = last['close'] - last['ema52']
-        price_ema_pct = (price_ema_diff / last['ema52']) * 100
-        if abs(price_ema_pct) < 2:
-            momentum_analysis.append(f"价格接近EMA52（{price_ema_pct:+.1f}%），归零轴状态")
-        elif price_ema_diff > 0:
-            momentum_analysis.append(f"价格在EMA52上方{price_ema_diff:.0f}点")
-        else:
-            momentum_analysis.append(f"价格在EMA52下方{abs(price_ema_diff):.0f}点")
-
-        # DEA位置判断
-        if abs(last['dea']) < 100:
-            momentum_analysis.append("DEA接近0轴，关注穿零轴信号")
-        elif last['dea'] > 500:
-            momentum_analysis.append("DEA较高，上涨动能充足")
-        elif last['dea'] < -500:
-            momentum_analysis.append("DEA较低，下跌动能较强")
-
-        charts_data[tf] = {
-            'candlestick': candlestick_data,
-            'dif': dif_data,
-            'dea': dea_data,
-            'histogram': histogram_data,
-            'ema26': ema26_data,
-            'ema52': ema52_data,
-            'momentum_analysis': momentum_analysis,
-            'latest': {
-                'datetime': last['datetime'],
-                'close': last['close'],
-                'dif': last['dif'],
-                'dea': last['dea'],
-                'histogram': last['histogram'],
-                'ema26': last['ema26'],
-                'ema52': last['ema52'],
-                'segment': '上涨线段 ↑' if last['dea'] > 0 else '下跌线段 ↓'
-            }
-        }
+        charts_data[tf] = build_timeframe_chart_data(db['timeframes'][tf]['candles'])
 
-    # 生成HTML
-    html_content = f"""<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>BTC 动能分析报告 - {datetime.now().strftime('%Y-%m-%d %H:%M')}</title>
-    <script src="https://unpkg.com/lightweight-charts/dist/lightweight-charts.standalone.production.js"></script>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            background: linear-gradient(135deg, #0a0a0a 0%, #1a1a1a 100%);
-            color: #e0e0e0;
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, sans-serif;
-            padding: 20px;
-            min-height: 100vh;
-        }}
-
-        .header {{
-            text-align: center;
-            padding: 30px 0;
-            background: rgba(20, 20, 20, 0.6);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            margin-bottom: 30px;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-        }}
-
-        .header h1 {{
-            font-size: 2.5em;
-            background: linear-gradient(90deg, #00ff88 0%, #00cc66 100%);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            margin-bottom: 10px;
-        }}
-
-        .header .subtitle {{
-            color: #888;
-            font-size: 1em;
-        }}
-
-        .trading-plans {{
-            display: grid;
-            grid-template-columns: repeat(3, 1fr);
-            gap: 20px;
-            margin-bottom: 30px;
-        }}
-
-        .plan-card {{
-            background: rgba(20, 20, 20, 0.6);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            padding: 25px;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-        }}
-
-        .plan-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 20px;
-            padding-bottom: 15px;
-            border-bottom: 2px solid rgba(0, 255, 136, 0.3);
-        }}
-
-        .plan-title {{
-            font-size: 1.5em;
-            color: #00ff88;
-            font-weight: 600;
-        }}
-
-        .plan-direction {{
-            padding: 5px 15px;
-            border-radius: 10px;
-            font-weight: 600;
-            font-size: 0.9em;
-        }}
-
-        .plan-direction.long {{
-            background: rgba(0, 255, 136, 0.2);
-            color: #00ff88;
-        }}
-
-        .plan-direction.short {{
-            background: rgba(255, 68, 102, 0.2);
-            color: #ff4466;
-        }}
-
-        .plan-direction.wait {{
-            background: rgba(255, 187, 0, 0.2);
-            color: #ffbb00;
-        }}
-
-        .plan-item {{
-            margin-bottom: 15px;
-        }}
-
-        .plan-label {{
-            color: #666;
-            font-size: 0.85em;
-            margin-bottom: 5px;
-        }}
-
-        .plan-value {{
-            color: #e0e0e0;
-            font-size: 1.1em;
-            font-weight: 600;
-        }}
-
-        .plan-value.price {{
-            color: #00ff88;
-            font-size: 1.3em;
-        }}
-
-        .plan-reason {{
-            margin-top: 15px;
-            padding: 12px;
-            background: rgba(255, 255, 255, 0.03);
-            border-radius: 10px;
-            font-size: 0.9em;
-            color: #999;
-            line-height: 1.5;
-        }}
-
-        @media (max-width: 1200px) {{
-            .trading-plans {{
-                grid-template-columns: 1fr;
-            }}
-        }}
-
-        .timeframe-section {{
-            margin-bottom: 40px;
-            background: rgba(20, 20, 20, 0.6);
-            backdrop-filter: blur(10px);
-            border-radius: 20px;
-            padding: 25px;
-            border: 1px solid rgba(255, 255, 255, 0.1);
-        }}
-
-        .timeframe-header {{
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 20px;
-            padding-bottom: 15px;
-            border-bottom: 2px solid rgba(0, 255, 136, 0.3);
-        }}
-
-        .timeframe-title {{
-            font-size: 1.8em;
-            color: #00ff88;
-            font-weight: 600;
-        }}
-
-        .timeframe-info {{
-            display: flex;
-            gap: 30px;
-            font-size: 0.95em;
-        }}
-
-        .info-item {{
-            display: flex;
-            flex-direction: column;
-            align-items: flex-end;
-        }}
-
-        .info-label {{
-            color: #666;
-            font-size: 0.85em;
-            margin-bottom: 3px;
-        }}
-
-        .info-value {{
-            color: #e0e0e0;
-            font-weight: 600;
-        }}
-
-        .info-value.positive {{
-            color: #00ff88;
-        }}
-
-        .info-value.negative {{
-            color: #ff4466;
-        }}
-
-        .charts-container {{
-            display: grid;
-            grid-template-columns: 1fr 300px;
-            gap: 20px;
-        }}
-
-        .charts-main {{
-            display: flex;
-            flex-direction: column;
-            gap: 15px;
-        }}
-
-        .chart-wrapper {{
-            background: rgba(10, 10, 10, 0.8);
-            border-radius: 15px;
-            padding: 15px;
-            border: 1px solid rgba(255, 255, 255, 0.05);
-        }}
-
-        .chart-title {{
-            color: #888;
-            font-size: 0.9em;
-            margin-bottom: 10px;
-            font-weight: 500;
-        }}
-
-        .analysis-panel {{
-            background: rgba(10, 10, 10, 0.8);
-            border-radius: 15px;
-            padding: 20px;
-            border: 1px solid rgba(255, 255, 255, 0.05);
-        }}
-
-        .analysis-title {{
-            color: #00ff88;
-            font-size: 1.1em;
-            margin-bottom: 15px;
-            font-weight: 600;
-        }}
-
-        .signal-item {{
-            padding: 12px;
-            margin-bottom: 10px;
-            border-radius: 10px;
-            background: rgba(0, 255, 136, 0.1);
-            border-left: 3px solid #00ff88;
-        }}
-
-        .signal-item.sell {{
-            background: rgba(255, 68, 102, 0.1);
-            border-left-color: #ff4466;
-        }}
-
-        .signal-label {{
-            color: #00ff88;
-            font-size: 0.85em;
-            margin-bottom: 5px;
-        }}
-
-        .signal-item.sell .signal-label {{
-            color: #ff4466;
-        }}
-
-        .signal-value {{
-            color: #e0e0e0;
-            font-size: 1.05em;
-            font-weight: 500;
-        }}
-
-        .metric-grid {{
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 10px;
-            margin-top: 15px;
-        }}
-
-        .metric-item {{
-            background: rgba(255, 255, 255, 0.03);
-            padding: 10px;
-            border-radius: 8px;
-        }}
-
-        .metric-label {{
-            color: #666;
-            font-size: 0.8em;
-            margin-bottom: 3px;
-        }}
-
-        .metric-value {{
-            color: #e0e0e0;
-            font-size: 1em;
-            font-weight: 600;
-        }}
-
-        @media (max-width: 1200px) {{
-            .charts-container {{
-                grid-template-columns: 1fr;
-            }}
-        }}
-    </style>
-</head>
-<body>
+    # 静态样式写到报告旁边，HTML 中只引用
+    write_stylesheet(os.path.dirname(os.path.abspath(output_file)))
+
+    # 生成HTML：分段写入带大缓冲的文件，不在内存中拼接整份字符串
+    with open(output_file, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(HTML_HEAD_TEMPLATE.format(title_time=generated_at[:16], stylesheet=STYLESHEET_FILE))
+        f.write(f"""<body>
     <div class="header">
         <h1>BTC 动能理论分析报告</h1>
-        <div class="subtitle">生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | 基于600根K线数据 | 当前价格: {trading_analysis['current_price']:.2f} USDT</div>
+        <div class="subtitle">生成时间: {generated_at} | 基于600根K线数据 | 当前价格: {trading_analysis['current_price']:.2f} USDT</div>
     </div>
 
     <!-- 交易计划板块 -->
@@ -673,240 +1090,17 @@ def generate_html(timeframes: List[str], output_file: str, analysis_text: str =
             </div>
         </div>
     </div>
-"""
-
-    # 为每个时间级别生成图表
-    for tf in timeframes:
-        if tf not in charts_data:
-            continue
-
-        data = charts_data[tf]
-        latest = data['latest']
+""")
 
-        # 判断颜色
-        dea_color = 'positive' if latest['dea'] > 0 else 'negative'
-        hist_color = 'positive' if latest['histogram'] > 0 else 'negative'
-
-        html_content += f"""
-    <div class="timeframe-section">
-        <div class="timeframe-header">
-            <div class="timeframe-title">{tf.upper()} 级别</div>
-            <div class="timeframe-info">
-                <div class="info-item">
-                    <div class="info-label">最新时间</div>
-                    <div class="info-value">{latest['datetime']}</div>
-                </div>
-                <div class="info-item">
-                    <div class="info-label">收盘价</div>
-                    <div class="info-value">{latest['close']:.2f}</div>
-                </div>
-                <div class="info-item">
-                    <div class="info-label">线段状态</div>
-                    <div class="info-value {dea_color}">{latest['segment']}</div>
-                </div>
-            </div>
-        </div>
-
-        <div class="charts-container">
-            <div class="charts-main">
-                <div class="chart-wrapper">
-                    <div class="chart-title">K线图 + EMA26/52</div>
-                    <div id="candlestick-{tf}" style="height: 400px;"></div>
-                </div>
+        # 为每个时间级别生成图表（charts_data 按 timeframes 顺序插入，缺失的级别已跳过）
+        f.write(''.join(render_timeframe_section(tf, data) for tf, data in charts_data.items()))
 
-                <div class="chart-wrapper">
-                    <div class="chart-title">MACD 指标</div>
-                    <div id="macd-{tf}" style="height: 200px;"></div>
-                </div>
-            </div>
-
-            <div class="analysis-panel">
-                <div class="analysis-title">技术指标</div>
-
-                <div class="metric-grid">
-                    <div class="metric-item">
-                        <div class="metric-label">EMA26</div>
-                        <div class="metric-value">{latest['ema26']:.2f}</div>
-                    </div>
-                    <div class="metric-item">
-                        <div class="metric-label">EMA52</div>
-                        <div class="metric-value">{latest['ema52']:.2f}</div>
-                    </div>
-                    <div class="metric-item">
-                        <div class="metric-label">DIF (黄线)</div>
-                        <div class="metric-value">{latest['dif']:.2f}</div>
-                    </div>
-                    <div class="metric-item">
-                        <div class="metric-label">DEA (白线)</div>
-                        <div class="metric-value {dea_color}">{latest['dea']:.2f}</div>
-                    </div>
-                    <div class="metric-item" style="grid-column: 1 / -1;">
-                        <div class="metric-label">Histogram</div>
-                        <div class="metric-value {hist_color}">{latest['histogram']:.2f}</div>
-                    </div>
-                </div>
-
-                <div style="margin-top: 20px;">
-                    <div class="analysis-title" style="font-size: 0.95em;">动能分析</div>
-                    {''.join([f'<div class="signal-item"><div class="signal-value" style="font-size: 0.9em;">{analysis}</div></div>' for analysis in data['momentum_analysis']])}
-                </div>
-
-                <div style="margin-top: 15px;">
-                    <div class="analysis-title" style="font-size: 0.95em;">关键位置</div>
-                    <div class="signal-item">
-                        <div class="signal-label">当前价格</div>
-                        <div class="signal-value">{latest['close']:.2f} USDT</div>
-                    </div>
-                    <div class="signal-item">
-                        <div class="signal-label">支撑位 (EMA52)</div>
-                        <div class="signal-value">{latest['ema52']:.2f}</div>
-                    </div>
-                    <div class="signal-item sell">
-                        <div class="signal-label">止损参考 (EMA52-300)</div>
-                        <div class="signal-value">{latest['ema52'] - 300:.2f}</div>
-                    </div>
-                </div>
-            </div>
-        </div>
-    </div>
-"""
-
-    # JavaScript代码
-    html_content += """
+        # JavaScript代码（图表数据以 gzip + base64 内嵌，浏览器端解压）
+        f.write("""
     <script>
-        const chartsData = """ + json.dumps(charts_data, indent=2) + """;
-
-        // 创建图表
-        Object.keys(chartsData).forEach(tf => {
-            const data = chartsData[tf];
-
-            // K线图
-            const candlestickChart = LightweightCharts.createChart(
-                document.getElementById(`candlestick-${tf}`),
-                {
-                    layout: {
-                        background: { color: '#0a0a0a' },
-                        textColor: '#888',
-                    },
-                    grid: {
-                        vertLines: { color: 'rgba(255, 255, 255, 0.05)' },
-                        horzLines: { color: 'rgba(255, 255, 255, 0.05)' },
-                    },
-                    crosshair: {
-                        mode: LightweightCharts.CrosshairMode.Normal,
-                    },
-                    rightPriceScale: {
-                        borderColor: 'rgba(255, 255, 255, 0.1)',
-                    },
-                    timeScale: {
-                        borderColor: 'rgba(255, 255, 255, 0.1)',
-                        timeVisible: true,
-                    },
-                }
-            );
-
-            const candlestickSeries = candlestickChart.addCandlestickSeries({
-                upColor: '#00ff88',
-                downColor: '#ff4466',
-                borderUpColor: '#00ff88',
-                borderDownColor: '#ff4466',
-                wickUpColor: '#00ff88',
-                wickDownColor: '#ff4466',
-            });
-            candlestickSeries.setData(data.candlestick);
-
-            // EMA26
-            const ema26Series = candlestickChart.addLineSeries({
-                color: '#ffa500',
-                lineWidth: 2,
-                title: 'EMA26',
-            });
-            ema26Series.setData(data.ema26);
-
-            // EMA52
-            const ema52Series = candlestickChart.addLineSeries({
-                color: '#00ccff',
-                lineWidth: 2,
-                title: 'EMA52',
-            });
-            ema52Series.setData(data.ema52);
-
-            // MACD图
-            const macdChart = LightweightCharts.createChart(
-                document.getElementById(`macd-${tf}`),
-                {
-                    layout: {
-                        background: { color: '#0a0a0a' },
-                        textColor: '#888',
-                    },
-                    grid: {
-                        vertLines: { color: 'rgba(255, 255, 255, 0.05)' },
-                        horzLines: { color: 'rgba(255, 255, 255, 0.05)' },
-                    },
-                    crosshair: {
-                        mode: LightweightCharts.CrosshairMode.Normal,
-                    },
-                    rightPriceScale: {
-                        borderColor: 'rgba(255, 255, 255, 0.1)',
-                    },
-                    timeScale: {
-                        borderColor: 'rgba(255, 255, 255, 0.1)',
-                        timeVisible: true,
-                    },
-                }
-            );
-
-            // Histogram
-            const histogramSeries = macdChart.addHistogramSeries({
-                priceFormat: {
-                    type: 'price',
-                },
-            });
-            histogramSeries.setData(data.histogram);
-
-            // DIF (黄线)
-            const difSeries = macdChart.addLineSeries({
-                color: '#ffeb3b',
-                lineWidth: 2,
-                title: 'DIF',
-            });
-            difSeries.setData(data.dif);
-
-            // DEA (白线)
-            const deaSeries = macdChart.addLineSeries({
-                color: '#ffffff',
-                lineWidth: 2,
-                title: 'DEA',
-            });
-            deaSeries.setData(data.dea);
-
-            // 同步时间轴
-            candlestickChart.timeScale().subscribeVisibleLogicalRangeChange(range => {
-                macdChart.timeScale().setVisibleLogicalRange(range);
-            });
-
-            macdChart.timeScale().subscribeVisibleLogicalRangeChange(range => {
-                candlestickChart.timeScale().setVisibleLogicalRange(range);
-            });
-
-            // 自适应大小
-            window.addEventListener('resize', () => {
-                candlestickChart.applyOptions({
-                    width: document.getElementById(`candlestick-${tf}`).clientWidth
-                });
-                macdChart.applyOptions({
-                    width: document.getElementById(`macd-${tf}`).clientWidth
-                });
-            });
-        });
-    </script>
-</body>
-</html>
-"""
-
-    # 写入文件
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+        const chartsDataRaw = \"""")
+        f.write(encode_chart_payload(charts_data))
+        f.write(CHART_SCRIPT)
 
     print(f"[SUCCESS] HTML report generated: {output_file}", file=sys.stderr)
     return output_file
@@ -942,10 +1136,9 @@ def main():
     print(f"时间级别: {', '.join(timeframes)}")
     print(f"{'='*60}\n")
 
-    # 在macOS上自动打开浏览器
-    import platform
-    if platform.system() == 'Darwin':
-        os.system(f'open "{output_file}"')
+    # 在macOS上自动打开浏览器（直接执行 open，不经过 shell，也不等待其退出）
+    if sys.platform == 'darwin':
+        subprocess.Popen(['open', output_file])
         print("✓ 已在浏览器中打开报告")
 
 
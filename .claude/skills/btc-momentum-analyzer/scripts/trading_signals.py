@@ -5,7 +5,148 @@
 严格按照THEORY.md中定义的买卖点规则判断进场信号
 """
 
-from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict, deque
+from enum import IntEnum
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Any, Optional, Tuple
+
+
+# 信号检测回看的K线数量（极限值、前高/前低都在这个窗口内判断）
+SIGNAL_WINDOW = 50
+
+# 信号结果缓存的条目上限（按最近使用淘汰）
+SIGNAL_CACHE_SIZE = 64
+
+# 缓存键里取自最新K线的字段
+_signal_key_fields = itemgetter('timestamp', 'open', 'high', 'low', 'close', 'ema52', 'dea', 'histogram')
+
+
+class SignalType(IntEnum):
+    """买卖点类型代码（结果里的 type_code；type 仍为展示用的中文名称）"""
+    BP1 = 1  # 买点1-极限买点
+    BP4 = 2  # 买点4-归零轴缩量买点
+    SP4 = 3  # 卖点4-归零轴缩量卖点
+
+
+# 买卖点类型 → 展示名称，只在生成结果字典时取一次
+_TYPE_LABELS = {
+    SignalType.BP1: '买点1-极限买点',
+    SignalType.BP4: '买点4-归零轴缩量买点',
+    SignalType.SP4: '卖点4-归零轴缩量卖点',
+}
+
+# 常用字段的取值函数（在 C 层取字典字段，配合 map 使用）
+_get_high = itemgetter('high')
+_get_low = itemgetter('low')
+_get_dea = itemgetter('dea')
+_field_getters = {'high': _get_high, 'low': _get_low, 'dea': _get_dea}
+
+_signal_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+
+class CandleWindow:
+    """
+    最近 SIGNAL_WINDOW 根K线的按需列视图（SoA）
+
+    last / prev 为最新两根K线，is_yang / is_yin / is_shrinking 为最新K线的
+    阴阳与MACD缩量判断；某个字段的列在第一次用到时才拆出，
+    之后各检测函数共用，不再各自遍历K线字典。
+    窗口为 candles[start:]，只在第一次扫描时切出一次，各扫描共用这一份。
+    """
+
+    __slots__ = ('candles', 'size', 'start', 'last', 'prev', 'is_yang', 'is_yin', 'is_shrinking',
+                 '_recent', '_columns')
+
+    def __init__(self, candles: List[Dict[str, Any]]):
+        self.candles = candles
+        self.size = min(len(candles), SIGNAL_WINDOW)
+        self.start = len(candles) - self.size
+        self.last = last = candles[-1]
+        self.prev = prev = candles[-2] if len(candles) > 1 else None
+
+        # 最新K线的阴阳与MACD缩量只算一次，各检测函数直接读取
+        self.is_yang = last['close'] > last['open']
+        self.is_yin = last['close'] < last['open']
+        hist = last['histogram']
+        prev_hist = prev['histogram'] if prev is not None else None
+        self.is_shrinking = hist is not None and prev_hist is not None and abs(hist) < abs(prev_hist)
+
+        self._recent: Optional[List[Dict[str, Any]]] = None
+        self._columns: Dict[str, List[Any]] = {}
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """窗口内的K线（旧 → 新），第一次调用时切出，之后复用"""
+        recent = self._recent
+        if recent is None:
+            recent = self._recent = self.candles[self.start:]
+        return recent
+
+    def column(self, field: str) -> List[Any]:
+        """窗口内某个字段的列（旧 → 新）"""
+        values = self._columns.get(field)
+        if values is None:
+            getter = _field_getters.get(field) or itemgetter(field)
+            values = self._columns[field] = list(map(getter, self.recent()))
+        return values
+
+
+class RollingExtrema:
+    """
+    滑动窗口最值（单调队列）
+
+    按顺序逐根 push，队列里只保留仍可能成为最值的 (序号, 值)，
+    每根K线均摊 O(1)，不必对每根K线重新扫描整个窗口。
+    """
+
+    def __init__(self, window: int = SIGNAL_WINDOW, find_max: bool = True):
+        self.window = window
+        self.find_max = find_max
+        self._queue: deque = deque()
+
+    def push(self, index: int, value: Optional[float]) -> Optional[float]:
+        """
+        加入第 index 根K线的值（None 只推进窗口、不参与比较），返回当前窗口最值
+
+        参数:
+            index: K线序号（须递增）
+            value: 该K线的字段值
+
+        返回:
+            窗口 [index-window+1, index] 内的最值，窗口内全为 None 时返回None
+        """
+        queue = self._queue
+        if value is not None:
+            if self.find_max:
+                while queue and queue[-1][1] <= value:
+                    queue.pop()
+            else:
+                while queue and queue[-1][1] >= value:
+                    queue.pop()
+            queue.append((index, value))
+
+        # 移出窗口之外的旧值
+        oldest = index - self.window
+        while queue and queue[0][0] <= oldest:
+            queue.popleft()
+
+        return queue[0][1] if queue else None
+
+
+def iter_window_extremes(candles: List[Dict[str, Any]]) -> Iterator[Tuple[Optional[float], float, float]]:
+    """
+    逐根K线给出截至该K线的窗口最值（回测时代替每根K线重新扫描窗口）
+
+    参数:
+        candles: K线数据列表
+
+    返回:
+        依次产出 (窗口最低DEA, 窗口最高价, 窗口最低价)
+    """
+    min_dea = RollingExtrema(find_max=False)
+    max_high = RollingExtrema(find_max=True)
+    min_low = RollingExtrema(find_max=False)
+    for i, c in enumerate(candles):
+        yield min_dea.push(i, c['dea']), max_high.push(i, c['high']), min_low.push(i, c['low'])
 
 
 def find_previous_high(candles: List[Dict[str, Any]], lookback: int = 50) -> float:
@@ -20,10 +161,71 @@ def find_previous_high(candles: List[Dict[str, Any]], lookback: int = 50) -> flo
         前期高点价格
     """
     recent_candles = candles[-lookback:] if len(candles) > lookback else candles
-    return max(c['high'] for c in recent_candles)
+    return max(map(_get_high, recent_candles))
+
+
+def dea_crossed_zero(candles: List[Dict[str, Any]], upward: bool) -> bool:
+    """
+    最近10根K线内DEA是否穿过0轴
+
+    参数:
+        candles: K线数据列表
+        upward: True 检测上穿（前一根 <= 0、后一根 > 0），False 检测下穿
+
+    返回:
+        是否出现穿越
+    """
+    # 每根K线的DEA只取一次（itemgetter 在 C 层完成），再按相邻两根从旧到新比较
+    recent = list(map(_get_dea, candles[-10:]))
+    pairs = zip(recent, recent[1:])
+    if upward:
+        return any(a <= 0 < b for a, b in pairs)
+    return any(a >= 0 > b for a, b in pairs)
+
+
+def _buy_point_1(last_k: Dict[str, Any], dea: float, min_dea: float, prev_high: float) -> Dict[str, Any]:
+    """买点1的结果字典（检测函数与回测共用）"""
+    o, h, l = last_k['open'], last_k['high'], last_k['low']
+    return {
+        'type': _TYPE_LABELS[SignalType.BP1],
+        'type_code': SignalType.BP1,
+        'entry': last_k['close'],
+        'stop_loss': o - 2 * (h - l),  # 开盘价 - 2*ATR
+        'target1': last_k['ema52'],  # EMA52
+        'target2': prev_high,  # 前高
+        'reason': f"下跌线段极限买点：DEA={dea:.0f}接近极限值{min_dea:.0f}，出现缩量阳K"
+    }
+
+
+def _buy_point_4(close: float, ema52: float, abs_diff: float, prev_high: float) -> Dict[str, Any]:
+    """买点4的结果字典（检测函数与回测共用）"""
+    price_ema52_diff_pct = abs_diff / ema52
+    return {
+        'type': _TYPE_LABELS[SignalType.BP4],
+        'type_code': SignalType.BP4,
+        'entry': close,
+        'stop_loss': ema52 - 300,  # 击破调控止损 (EMA52-300)
+        'target1': ema52,  # EMA52
+        'target2': prev_high,  # 穿过零轴之后的前高
+        'reason': f"归零轴缩量买点：上涨线段u1，价格接近EMA52({price_ema52_diff_pct*100:.1f}%)，出现缩量阳K"
+    }
 
 
-def detect_buy_point_1(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def _sell_point_4(close: float, ema52: float, abs_diff: float, prev_low: float) -> Dict[str, Any]:
+    """卖点4的结果字典（检测函数与回测共用）"""
+    price_ema52_diff_pct = abs_diff / ema52
+    return {
+        'type': _TYPE_LABELS[SignalType.SP4],
+        'type_code': SignalType.SP4,
+        'entry': close,
+        'stop_loss': ema52 + 300,  # 击破调控止损
+        'target1': ema52,  # EMA52
+        'target2': prev_low,  # 前低
+        'reason': f"归零轴缩量卖点：下跌线段u1，价格接近EMA52({price_ema52_diff_pct*100:.1f}%)，出现缩量阴K"
+    }
+
+
+def detect_buy_point_1(window: CandleWindow) -> Optional[Dict[str, Any]]:
     """
     买点1: unit极限买点
 
@@ -33,49 +235,53 @@ def detect_buy_point_1(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]
     3. 产生第一个阳K
     4. 对应的MACD缩量
 
+    参数:
+        window: 最近K线的列视图（CandleWindow）
+
     返回:
         如果检测到买点, 返回包含买点信息的字典, 否则返回None
     """
-    if len(candles) < 10:
+    if window.size < 10:
         return None
 
-    last_k = candles[-1]
-    prev_k = candles[-2]
+    last_k = window.last
+    dea = last_k['dea']
 
     # 条件1: 下跌线段
-    if last_k['dea'] >= 0:
-        return None
-
-    # 条件2: DEA接近历史极限值 (最低值的90%以内)
-    recent_dea_values = [c['dea'] for c in candles[-50:] if c['dea'] is not None]
-    min_dea = min(recent_dea_values)
-    if last_k['dea'] > min_dea * 0.9:  # 不够接近极限
+    if dea >= 0:
         return None
 
     # 条件3: 阳K
-    is_yang_k = last_k['close'] > last_k['open']
-    if not is_yang_k:
+    if not window.is_yang:
         return None
 
     # 条件4: MACD缩量
-    is_shrinking = abs(last_k['histogram']) < abs(prev_k['histogram'])
-    if not is_shrinking:
+    if not window.is_shrinking:
         return None
 
-    # 找前期高点作为目标位2
-    prev_high = find_previous_high(candles, lookback=50)
+    # 条件2: DEA接近历史极限值 (最低值的90%以内)
+    # 需要扫描整个窗口，放在 O(1) 的阳K、缩量判断之后
+    # 同一次遍历顺带求出窗口最高价（前期高点），不再为它单独扫描一遍
+    # 以最新K线（已确认DEA<0，不是None）为初值，循环里不用再判断初值是否为None，
+    # 只需跳过预热期DEA为None的K线
+    min_dea = dea
+    prev_high = last_k['high']
+    for c in window.recent():
+        d = c['dea']
+        if d is not None and d < min_dea:
+            min_dea = d
+        h = c['high']
+        if h > prev_high:
+            prev_high = h
+
+    if dea > min_dea * 0.9:  # 不够接近极限
+        return None
 
-    return {
-        'type': '买点1-极限买点',
-        'entry': last_k['close'],
-        'stop_loss': last_k['open'] - 2 * (last_k['high'] - last_k['low']),  # 开盘价 - 2*ATR
-        'target1': last_k['ema52'],  # EMA52
-        'target2': prev_high,  # 前高
-        'reason': f"下跌线段极限买点：DEA={last_k['dea']:.0f}接近极限值{min_dea:.0f}，出现缩量阳K"
-    }
+    # 前期高点（上面已求出）作为目标位2
+    return _buy_point_1(last_k, dea, min_dea, prev_high)
 
 
-def detect_buy_point_4(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def detect_buy_point_4(window: CandleWindow) -> Optional[Dict[str, Any]]:
     """
     买点4: 归零轴缩量买点
 
@@ -85,58 +291,47 @@ def detect_buy_point_4(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]
     3. 出现阳K且MACD缩量
     4. 该时间级别为u1 (穿零轴后第一次有效时间级别)
 
+    参数:
+        window: 最近K线的列视图（CandleWindow）
+
     返回:
         如果检测到买点, 返回包含买点信息的字典, 否则返回None
     """
-    if len(candles) < 10:
+    if window.size < 10:
         return None
 
-    last_k = candles[-1]
-    prev_k = candles[-2]
+    last_k = window.last
 
     # 条件1: 上涨线段
     if last_k['dea'] <= 0:
         return None
 
     # 条件2: 价格接近EMA52 (严格标准: 1%以内)
-    price_ema52_diff_pct = abs(last_k['close'] - last_k['ema52']) / last_k['ema52']
-    if price_ema52_diff_pct > 0.01:  # 超过1%不算归零轴
+    # 用乘法比较，百分比只在生成 reason 时才算
+    close, ema52 = last_k['close'], last_k['ema52']
+    abs_diff = abs(close - ema52)
+    if abs_diff > 0.01 * ema52:  # 超过1%不算归零轴
         return None
 
     # 条件3: 阳K
-    is_yang_k = last_k['close'] > last_k['open']
-    if not is_yang_k:
+    if not window.is_yang:
         return None
 
     # 条件4: MACD缩量
-    is_shrinking = abs(last_k['histogram']) < abs(prev_k['histogram'])
-    if not is_shrinking:
+    if not window.is_shrinking:
         return None
 
     # 检查是否为u1 (DEA刚穿过0轴不久, 10根K线以内)
-    zero_cross_recent = False
-    for i in range(max(0, len(candles)-10), len(candles)-1):
-        if candles[i]['dea'] <= 0 and candles[i+1]['dea'] > 0:
-            zero_cross_recent = True
-            break
+    zero_cross_recent = dea_crossed_zero(window.recent(), upward=True)
 
     if not zero_cross_recent:
         return None
 
     # 找前期高点作为目标位2
-    prev_high = find_previous_high(candles, lookback=50)
-
-    return {
-        'type': '买点4-归零轴缩量买点',
-        'entry': last_k['close'],
-        'stop_loss': last_k['ema52'] - 300,  # 击破调控止损 (EMA52-300)
-        'target1': last_k['ema52'],  # EMA52
-        'target2': prev_high,  # 穿过零轴之后的前高
-        'reason': f"归零轴缩量买点：上涨线段u1，价格接近EMA52({price_ema52_diff_pct*100:.1f}%)，出现缩量阳K"
-    }
+    return _buy_point_4(close, ema52, abs_diff, max(window.column('high')))
 
 
-def detect_sell_point_4(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+def detect_sell_point_4(window: CandleWindow) -> Optional[Dict[str, Any]]:
     """
     卖点4: 归零轴缩量卖点
 
@@ -145,111 +340,251 @@ def detect_sell_point_4(candles: List[Dict[str, Any]]) -> Optional[Dict[str, Any
     2. 价格归零轴 (价格接近EMA52, 误差<1%)
     3. 出现阴K且MACD缩量
     4. 该时间级别为u1 (穿零轴后第一次有效时间级别)
+
+    参数:
+        window: 最近K线的列视图（CandleWindow）
     """
-    if len(candles) < 10:
+    if window.size < 10:
         return None
 
-    last_k = candles[-1]
-    prev_k = candles[-2]
+    last_k = window.last
 
     # 条件1: 下跌线段
     if last_k['dea'] >= 0:
         return None
 
     # 条件2: 价格接近EMA52
-    price_ema52_diff_pct = abs(last_k['close'] - last_k['ema52']) / last_k['ema52']
-    if price_ema52_diff_pct > 0.01:
+    close, ema52 = last_k['close'], last_k['ema52']
+    abs_diff = abs(close - ema52)
+    if abs_diff > 0.01 * ema52:
         return None
 
     # 条件3: 阴K
-    is_yin_k = last_k['close'] < last_k['open']
-    if not is_yin_k:
+    if not window.is_yin:
         return None
 
     # 条件4: MACD缩量
-    is_shrinking = abs(last_k['histogram']) < abs(prev_k['histogram'])
-    if not is_shrinking:
+    if not window.is_shrinking:
         return None
 
     # 检查是否为u1
-    zero_cross_recent = False
-    for i in range(max(0, len(candles)-10), len(candles)-1):
-        if candles[i]['dea'] >= 0 and candles[i+1]['dea'] < 0:
-            zero_cross_recent = True
-            break
+    zero_cross_recent = dea_crossed_zero(window.recent(), upward=False)
 
     if not zero_cross_recent:
         return None
 
     # 找前期低点作为目标位2
-    recent_candles = candles[-50:]
-    prev_low = min(c['low'] for c in recent_candles)
+    return _sell_point_4(close, ema52, abs_diff, min(window.column('low')))
 
-    return {
-        'type': '卖点4-归零轴缩量卖点',
-        'entry': last_k['close'],
-        'stop_loss': last_k['ema52'] + 300,  # 击破调控止损
-        'target1': last_k['ema52'],  # EMA52
-        'target2': prev_low,  # 前低
-        'reason': f"归零轴缩量卖点：下跌线段u1，价格接近EMA52({price_ema52_diff_pct*100:.1f}%)，出现缩量阴K"
-    }
 
+# 买卖点分派表: (K线方向, DEA方向) → (信号类型, 检测函数)
+# K线方向 1=阳K、-1=阴K；DEA方向 1=DEA>0、-1=DEA<0。
+# 三个买卖点的前置条件互斥，每种组合至多对应一个检测函数；新增买卖点只需在这里登记
+_SIGNAL_RULES: Dict[Tuple[int, int], Tuple[str, Callable[[CandleWindow], Optional[Dict[str, Any]]]]] = {
+    (1, -1): ('buy', detect_buy_point_1),
+    (1, 1): ('buy', detect_buy_point_4),
+    (-1, -1): ('sell', detect_sell_point_4),
+}
 
-def analyze_trading_signals(db: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
+
+def detect_signal(window: CandleWindow) -> Optional[Tuple[str, Dict[str, Any]]]:
     """
-    分析指定时间级别的交易信号
+    一次性检测全部买卖点（融合三个检测函数的公共前置条件）
+
+    三个买卖点都要求MACD缩量，且由DEA正负和K线阴阳互斥地决定：
+    DEA<0 阳K → 买点1，DEA>0 阳K → 买点4，DEA<0 阴K → 卖点4。
+    先对最新K线做一次这些 O(1) 判断，再从 _SIGNAL_RULES 查出唯一可能成立的
+    检测函数调用，最多触发一个信号，优先级与逐个检测一致。
 
     参数:
-        db: 数据库字典
-        timeframe: 时间级别 (如 '4h', '1h')
+        window: 最近K线的列视图（CandleWindow）
 
     返回:
-        交易信号分析结果
+        (信号类型 'buy'/'sell', 买卖点信息)，无信号返回None
     """
-    if timeframe not in db['timeframes']:
-        return {'has_signal': False, 'reason': f'{timeframe}数据不存在'}
+    if window.size < 10:
+        return None
 
-    candles = db['timeframes'][timeframe]['candles']
+    # 公共条件: MACD缩量
+    if not window.is_shrinking:
+        return None
 
-    # 按优先级检测买卖点
-    # 优先级: 买点1(极限) > 买点4(归零轴) > 卖点4(归零轴)
+    # 十字星（既非阳K也非阴K）不对应任何买卖点
+    if window.is_yang:
+        body = 1
+    elif window.is_yin:
+        body = -1
+    else:
+        return None
 
-    # 检测买点1: 极限买点
-    buy_point_1 = detect_buy_point_1(candles)
-    if buy_point_1:
-        return {
-            'has_signal': True,
-            'signal_type': 'buy',
-            **buy_point_1
-        }
+    dea = window.last['dea']
+    rule = _SIGNAL_RULES.get((body, (dea > 0) - (dea < 0)))
+    if rule is None:
+        return None
+
+    signal_type, detect = rule
+    point = detect(window)
+    return (signal_type, point) if point else None
 
-    # 检测买点4: 归零轴缩量买点
-    buy_point_4 = detect_buy_point_4(candles)
-    if buy_point_4:
-        return {
-            'has_signal': True,
-            'signal_type': 'buy',
-            **buy_point_4
-        }
 
-    # 检测卖点4: 归零轴缩量卖点
-    sell_point_4 = detect_sell_point_4(candles)
-    if sell_point_4:
+def analyze_candles(candles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    分析一组K线的交易信号（不经过缓存）
+
+    最近K线只构建一次列视图（CandleWindow），由 detect_signal 统一检测。
+
+    参数:
+        candles: K线数据列表
+
+    返回:
+        交易信号分析结果（总是附带最新K线的 last_close / last_ema52）
+    """
+    # 按优先级检测买卖点
+    # 优先级: 买点1(极限) > 买点4(归零轴) > 卖点4(归零轴)
+    # 长度、最新K线只取一次：窗口里已有 last，不足10根时才直接取
+    if len(candles) >= 10:
+        window = CandleWindow(candles)
+        last_k = window.last
+        signal = detect_signal(window)
+    else:
+        last_k = candles[-1]
+        signal = None
+    if signal:
+        signal_type, point = signal
         return {
             'has_signal': True,
-            'signal_type': 'sell',
-            **sell_point_4
+            'signal_type': signal_type,
+            **point,
+            'last_close': last_k['close'],
+            'last_ema52': last_k['ema52']
         }
 
     # 无明确买卖点信号
-    last_k = candles[-1]
     return {
         'has_signal': False,
         'signal_type': 'wait',
-        'reason': f"等待买卖点信号 (当前DEA={last_k['dea']:.0f}, 价格距EMA52={((last_k['close']-last_k['ema52'])/last_k['ema52']*100):+.1f}%)"
+        'reason': f"等待买卖点信号 (当前DEA={last_k['dea']:.0f}, 价格距EMA52={((last_k['close']-last_k['ema52'])/last_k['ema52']*100):+.1f}%)",
+        'last_close': last_k['close'],
+        'last_ema52': last_k['ema52']
     }
 
 
+def backtest_signals(candles: List[Dict[str, Any]]) -> List[Tuple[int, str, Dict[str, Any]]]:
+    """
+    回测：一次遍历给出每根K线收盘时的买卖点信号
+
+    结果与对每个前缀 candles[:i+1] 调用 analyze_candles 一致，但窗口最低DEA、
+    最高价、最低价由 iter_window_extremes 滑动维护（每根K线均摊 O(1)），
+    不再为每根K线重建窗口、重新扫描50根K线。判断顺序与 detect_signal 及
+    各检测函数相同。指标预热期（DEA/EMA52 尚为None）的K线不产生信号，
+    analyze_candles 在这些前缀上会直接报错。
+
+    参数:
+        candles: K线数据列表（旧 → 新）
+
+    返回:
+        [(K线序号, 信号类型 'buy'/'sell', 买卖点信息), ...]，只含出现信号的K线
+    """
+    signals = []
+    prev_hist = None
+    last_dea_none = -SIGNAL_WINDOW  # 最近一根DEA为None（预热期）的K线序号
+    for i, (c, (min_dea, max_high, min_low)) in enumerate(zip(candles, iter_window_extremes(candles))):
+        if c['dea'] is None:
+            last_dea_none = i
+        hist = c['histogram']
+        shrinking = hist is not None and prev_hist is not None and abs(hist) < abs(prev_hist)
+        prev_hist = hist
+
+        # 同 detect_signal: 至少10根K线、MACD缩量、阳K/阴K
+        if i < 9 or not shrinking:
+            continue
+        close, open_ = c['close'], c['open']
+        if close > open_:
+            body = 1
+        elif close < open_:
+            body = -1
+        else:
+            continue
+        dea = c['dea']
+        if dea is None:  # 指标预热期，不产生信号
+            continue
+        trend = (dea > 0) - (dea < 0)
+
+        if body == 1 and trend == -1:
+            # 买点1: DEA接近窗口极限值
+            if dea > min_dea * 0.9:
+                continue
+            signals.append((i, 'buy', _buy_point_1(c, dea, min_dea, max_high)))
+        elif body == trend:
+            # 买点4 / 卖点4: 价格归零轴且最近10根K线内DEA穿过0轴
+            ema52 = c['ema52']
+            if ema52 is None:  # 指标预热期，不产生信号
+                continue
+            abs_diff = abs(close - ema52)
+            if abs_diff > 0.01 * ema52:
+                continue
+            if i - last_dea_none < 10:  # 最近10根K线里还有预热期的DEA
+                continue
+            if not dea_crossed_zero(candles[i - 9:i + 1], upward=body == 1):
+                continue
+            if body == 1:
+                signals.append((i, 'buy', _buy_point_4(close, ema52, abs_diff, max_high)))
+            else:
+                signals.append((i, 'sell', _sell_point_4(close, ema52, abs_diff, min_low)))
+
+    return signals
+
+
+def analyze_trading_signals(db: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
+    """
+    分析指定时间级别的交易信号
+
+    参数:
+        db: 数据库字典
+        timeframe: 时间级别 (如 '4h', '1h')
+
+    返回:
+        交易信号分析结果
+    """
+    # 时间级别的数据只查一次，K线列表直接交给 analyze_timeframe_candles
+    tfdb = db['timeframes'].get(timeframe)
+    if tfdb is None:
+        return {'has_signal': False, 'reason': f'{timeframe}数据不存在'}
+
+    return analyze_timeframe_candles(timeframe, tfdb['candles'])
+
+
+def analyze_timeframe_candles(timeframe: str, candles: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    分析某个时间级别已取出的K线列表的交易信号（调用方已持有K线列表时直接使用）
+
+    结果按 (时间级别, K线数量, 最新K线的价格与指标) 缓存：同一根K线重复查询
+    （如同一报告里多次生成交易计划）直接复用；最新K线被原地更新时键随之变化。
+    返回的是缓存结果的副本，调用方可以自由修改。
+
+    参数:
+        timeframe: 时间级别 (如 '4h', '1h')，用作缓存键
+        candles: 该时间级别的K线数据列表
+
+    返回:
+        交易信号分析结果
+    """
+    if not candles:
+        return analyze_candles(candles)
+
+    key = (timeframe, len(candles), _signal_key_fields(candles[-1]))
+    result = _signal_cache.get(key)
+    if result is None:
+        result = analyze_candles(candles)
+        _signal_cache[key] = result
+        if len(_signal_cache) > SIGNAL_CACHE_SIZE:
+            _signal_cache.popitem(last=False)
+    else:
+        _signal_cache.move_to_end(key)
+
+    return dict(result)
+
+
 def generate_trading_plan(db: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
     """
     生成交易计划
@@ -262,7 +597,6 @@ def generate_trading_plan(db: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
         交易计划字典
     """
     signal = analyze_trading_signals(db, timeframe)
-    last_k = db['timeframes'][timeframe]['candles'][-1]
 
     if signal['has_signal'] and signal['signal_type'] == 'buy':
         return {
@@ -289,7 +623,7 @@ def generate_trading_plan(db: Dict[str, Any], timeframe: str) -> Dict[str, Any]:
         return {
             'direction': '观望',
             'entry': None,
-            'stop_loss': last_k['ema52'] - 300,
+            'stop_loss': signal['last_ema52'] - 300,
             'target1': None,
             'target2': None,
             'reason': signal['reason'],